@@ -1,318 +1,522 @@
-from flask import Flask, render_template,request
-import folium
-from folium import Element
-# Removed heavy imports for performance:
-import requests  # Needed for satellite API calls
-# import geopandas as gpd  # Heavy geospatial library - disabled
-# from shapely.geometry import Point  # Not used with land checking disabled
-import time
+from flask import Flask, Response, abort, render_template,request
 import json
-import re
 import math
-import heapq
-import ast  # Safe way to parse Python literal structures
-def get_distances(max_distance, hour, jack_enabled):
-    def distance_3d(point1,point2):
-        def to_xyz(lat, lon, alt_km):
-            R = 6371 + alt_km  # Earth radius + altitude
-            lat_rad = math.radians(lat)
-            lon_rad = math.radians(lon)
-            x = R * math.cos(lat_rad) * math.cos(lon_rad)
-            y = R * math.cos(lat_rad) * math.sin(lon_rad)
-            z = R * math.sin(lat_rad)
-            return x, y, z
-
-        x1, y1, z1 = to_xyz(point1[0],point1[1], point1[2])
-        x2, y2, z2 = to_xyz(point2[0],point2[1], point2[2])
-        return math.sqrt((x1 - x2)**2 + (y1 - y2)**2 + (z1 - z2)**2)
-
-    # Skip land checking for performance - comment out for production use
-    # land = gpd.read_file("natural_earth_land/ne_110m_land.shp") 
-
-    def is_on_land(lat, lon):
-        # Disabled for performance - always return True
-        return True
-        # point = Point(lon, lat)
-        # return any(land.geometry.contains(point))
-
-
-
-
-    def get_coordinates(hours = "00"):
-        url = f'https://a.windbornesystems.com/treasure/{hours}.json'
+import hashlib
+import zlib
+import numpy as np
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from executor import DONE, ComputeExecutor, JobPending
+from metrics_cube import MetricsCube, cube_key, cube_path
+from network import MAX_RANGE_KM
+from pipeline import (build_path_data, build_station_data, compute_coverage, compute_metrics_cube,
+                      compute_result, compute_stations, compute_timeline, map_shell, marker_features)
+from profiling import profile_call, requested_format
+from registry import ResultRegistry, result_key
+from relays import get_relay_catalog
+from results import ResultCache
+from snapshots import SnapshotPrefetcher, SnapshotStore
+from telemetry import StageTrace, query_labels, render_metrics, timed_stage
+
+# Parsed treasure hours, cached in memory and on disk between requests
+snapshot_store = SnapshotStore()
+
+# Whole routing results keyed by result_key(snapshot version, hour, range, relay flag,
+# relay catalog version)
+result_cache = ResultCache()
+
+# The same results shared with the other workers, so path requests can be
+# answered by any process
+registry = ResultRegistry()
+
+# FCC relays parsed once, before the compute workers fork and share it
+relay_catalog = get_relay_catalog()
+
+# Graph build and routing run in worker processes, forked before the
+# prefetch thread starts
+executor = ComputeExecutor(registry.path)
+executor.start()
+
+# Seconds a page request waits for its routing job before answering 202
+COMPUTE_WAIT = 20
+
+# Time-expanded routing over all hours, keyed by the snapshot versions, range and relay flag
+timeline_cache = ResultCache(max_entries=8)
+
+# Coverage-vs-range curves keyed by snapshot version and relay flag
+coverage_cache = ResultCache(max_entries=48)
+
+# Sidebar metrics for every hour and range bucket, per relay flag; loaded
+# from disk at startup and rebuilt in the background when a snapshot or the
+# relay catalog changes
+metrics_cubes = {jack: MetricsCube.load(cube_path(jack)) for jack in (False, True)}
+if metrics_cubes[True] is not None and metrics_cubes[True].relay_version != relay_catalog.version:
+    metrics_cubes[True] = None  # built over a previous relay file
+
+valid_hours = [f"{h:02}" for h in range(24)]
+
+def available_snapshots():
+    """
+    (hours ago, snapshot) for every non-empty cached hour, newest first.
+    Only reads what the prefetcher has stored, so callers never wait on
+    upstream.
+    """
+    snapshots = [(int(hours), snapshot_store.peek(hours)) for hours in valid_hours]
+    return [(hours, snapshot) for hours, snapshot in snapshots if snapshot is not None and len(snapshot)]
+
+def refresh_metrics_cube(jack_enabled):
+    """
+    Latest metrics cube for the relay flag (None before the first build)
+    and the key of the job rebuilding it, or None if it matches the
+    current snapshots.
+    """
+    snapshots = available_snapshots()
+    cube = metrics_cubes[jack_enabled]
+    versions = {hours: snapshot.version for hours, snapshot in snapshots}
+    relay_version = relay_catalog.version if jack_enabled else ""
+    if not snapshots or (cube is not None and cube.matches(versions, relay_version)):
+        return cube, None
+    key = cube_key(versions, jack_enabled, relay_version)
+    future = executor.call(key, compute_metrics_cube, snapshots, jack_enabled, cube_path(jack_enabled),
+                           relay_version)
+    future.add_done_callback(lambda done: store_metrics_cube(jack_enabled, done))
+    return cube, key
+
+def store_metrics_cube(jack_enabled, future):
+    if future.cancelled() or future.exception() is not None:
+        print(f"Metrics cube build failed: {future.exception() if not future.cancelled() else 'cancelled'}")
+        return
+    metrics_cubes[jack_enabled] = future.result()
+
+def refresh_metrics_cubes():
+    for jack_enabled in (False, True):
+        refresh_metrics_cube(jack_enabled)
+
+# Keep all 24 hours refreshed in the background so requests never block on
+# upstream, and the metrics cubes in step with them
+prefetcher = SnapshotPrefetcher(snapshot_store, valid_hours, on_refresh=refresh_metrics_cubes)
+prefetcher.start()
+
+
+def get_result(hour, max_range, jack_enabled, wait=COMPUTE_WAIT, inline=False):
+    """
+    Routing result for the slider values, reused while the snapshot is unchanged.
+    Raises JobPending if it is still being computed after wait seconds.
+    inline computes it afresh in this thread instead, for profiling.
+    """
+    snapshot = snapshot_store.get(valid_hours[hour])
+    if snapshot is None:
+        return None
+    key = result_key(snapshot.version, hour, max_range, jack_enabled, relay_catalog.version)
+    if inline:
+        result = compute_result(snapshot, max_range, jack_enabled, key)
+        if result is None:
+            return None
+        result.query = (hour, max_range, jack_enabled)
+        registry.put(result, hour, max_range, jack_enabled, snapshot.version)
+        result_cache.put(key, result)
+        return result
+    result = result_cache.get(key)
+    if result is not None:
+        if not registry.touch(key):
+            # Pruned by another worker while still cached here
+            registry.put(result, hour, max_range, jack_enabled, snapshot.version)
+        return result
+    result = registry.get(key)
+    if result is None:
+        labels = query_labels(hour, max_range, jack_enabled)
+        future = executor.submit(key, snapshot, hour, max_range, jack_enabled,
+                                 on_done=lambda done: observe_job(done, labels))
         try:
-            response = requests.get(url)
-            response.raise_for_status()  # Raise error for bad status codes
-            try:
-                return response.json()
-            except json.JSONDecodeError as e:
-                print(f"[{hour}] JSON decode error: {e}")
-                print("Attempting to sanitize and reformat...")
-
-                lines = response.text.strip().splitlines()
-
-                # Filter lines that look like [x, y, z]
-                array_lines = [line.strip() for line in lines if line.strip().startswith('[') and line.strip().endswith(']')]
-
-                # Replace NaN, Infinity with null
-                array_lines = [re.sub(r'\b(NaN|Infinity|-Infinity)\b', 'null', line) for line in array_lines]
-
-                # Join into a single JSON array
-                fixed_json = "[\n" + ",\n".join(array_lines) + "\n]"
-
-                try:
-                    return json.loads(fixed_json)
-                except json.JSONDecodeError as e2:
-                    print(f"[{hour}] Still failed after fixing format: {e2}")
-                    return []
-        except requests.RequestException as e:
-            print(f"HTTP error occurred: {e}")
-            return []
-        except ValueError:
-            print("Error parsing JSON.")
-            return []
-
-    #points = get_coordinates()
-    valid_hours = [f"{h:02}" for h in range(24)]
-    points = get_coordinates(valid_hours[hour])
-
-    if(len(points) == 0):
-        return ([],[],0)
-    palo_alto_office = [37.419,-122.106,0]
-    points.insert(0,palo_alto_office)
-    i = 0
-    for point in points:
-        point.append(i)
-        # point.append(False)
-        i += 1
-    fcc_start = -1
-    if(jack_enabled):
-        with open("fcc_facilities.json", "r") as f:
-            fcc_facilities = json.load(f)
-        fcc_start = i
-        for facility in fcc_facilities:
-            lat = facility['lat']
-            lon = facility['lon']
-            alt = facility.get('height', 0) / 3.281  # Convert feet to meters for altitude
-            points.append([lat, lon, alt, i])
-            i += 1
-
-
-
-    def calculate_distance(max_distance = 1000):
-        res = [[] for point in points]
-        for point1 in points:
-            for point2 in points:
-                if(point1[3] == point2[3]):
-                    continue
-                dis = distance_3d(point1, point2)
-                if(dis < max_distance):
-                    res[point1[3]].append((point2[3],dis))
-        return res
-
-
-    neighbor_arr = calculate_distance(max_distance)
-
-
-    def djikstra(graph, start=0):
-        distances = [([],float('inf')) for node in graph]
-        distances[start] = ([],0)
-
-        # Min-heap priority queue: (distance, node)
-        priority_queue = [(0, start)]
-        while(priority_queue):
-            current_distance, current_node = heapq.heappop(priority_queue)
-            # Skip if we already found a shorter path
-            if current_distance > distances[current_node][1]:
-                #print(current_distance, distances[current_node][1])
-                continue
-
-            for neighbor, weight in graph[current_node]:
-                distance = current_distance + weight
-                if distance < distances[neighbor][1]:
-                    distances[neighbor] = (distances[current_node][0] + [current_node],distance)
-                    heapq.heappush(priority_queue, (distance, neighbor))
-        return distances
-    return (points, djikstra(neighbor_arr), fcc_start)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-def add_markers(points, distances, fcc_start, only_land = True):
-    # Create minimal map with no markers initially
-    m = folium.Map(location=[points[0][0], points[0][1]], tiles="https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png",
-        attr='&copy; <a href="https://carto.com/">CartoDB</a>', zoom_start=4, min_zoom=3, max_zoom=10)
-    
-    # Prepare marker data for JavaScript instead of adding to Folium
-    marker_data = []
-    for lat, lon, alt, id in points:
-        if math.isnan(lat) or math.isnan(lon):
-            continue
-        fcc_relay = (fcc_start >= 0 and id >= fcc_start)
-        reachable = True if id == 0 else (id < len(distances) and len(distances[id][0]) > 0)
-        
-        marker_info = {
-            'id': id,
-            'lat': lat,
-            'lon': lon,
-            'alt': alt,
-            'fcc_relay': fcc_relay,
-            'reachable': reachable,
-            'is_hq': (id == 0),
-            'distance': distances[id][1] if id < len(distances) and len(distances[id]) > 1 else 0
-        }
-        marker_data.append(marker_info)
-    
-    m.get_root().html.add_child(folium.Element(f"""
-    <script>
-        var markerData = {json.dumps(marker_data)};
-        var pathData = {{}};
-        var activePaths = {{}};
-        var pathDataLoaded = false;
-        var markersAdded = false;
-        
-        document.addEventListener("DOMContentLoaded", function() {{
-            window.myMap = {m.get_name()};
-            
-            // Load path data from API with better error handling
-            fetch('/api/paths')
-                .then(response => {{
-                    if (!response.ok) {{
-                        throw new Error(`HTTP ${{response.status}}: Failed to load path data`);
-                    }}
-                    return response.json();
-                }})
-                .then(data => {{
-                    pathData = data;
-                    pathDataLoaded = true;
-                    console.log('Path data loaded:', Object.keys(pathData).length, 'paths');
-                }})
-                .catch(error => {{
-                    console.error('Error loading path data:', error);
-                    pathDataLoaded = false;
-                    // Show user-friendly error
-                    setTimeout(() => {{
-                        if (typeof showMessage === 'function') {{
-                            showMessage('Unable to load routing data. Path visualization may be limited.', 'error');
-                        }}
-                    }}, 1000);
-                }});
-            
-            // Add markers via JavaScript instead of Folium
-            function addMarkers() {{
-                console.log('Adding', markerData.length, 'markers');
-                var reachableCount = 0;
-                markerData.forEach(function(marker) {{
-                    var color = marker.reachable ? 'blue' : 'red';
-                    var radius = marker.fcc_relay ? 3 : 5;
-                    if (marker.reachable) reachableCount++;
-                    
-                    if (marker.is_hq) {{
-                        // Add HQ marker with windborn.png icon
-                        var hqIcon = L.icon({{
-                            iconUrl: '/static/windborn.png',
-                            iconSize: [30, 30],
-                            iconAnchor: [15, 15],
-                            popupAnchor: [0, -15]
-                        }});
-                        L.marker([marker.lat, marker.lon], {{icon: hqIcon}})
-                         .bindPopup("Palo Alto HQ")
-                         .addTo(window.myMap);
-                    }} else {{
-                        var circleMarker = L.circleMarker([marker.lat, marker.lon], {{
-                            radius: radius,
-                            fillColor: color,
-                            color: 'black',
-                            weight: 2,
-                            fillOpacity: 0.8
-                        }}).bindPopup("Node " + marker.id + (marker.reachable ? " - Distance: " + marker.distance.toFixed(2) + " km" : ""))
-                          .bindTooltip(marker.lat + "," + marker.lon + "," + marker.alt + (marker.reachable && !marker.fcc_relay ? " - Click to show path" : ""))
-                          .addTo(window.myMap);
-                        
-                        if (marker.reachable && !marker.fcc_relay) {{
-                            circleMarker.on('click', function() {{
-                                if (pathDataLoaded) {{
-                                    window.togglePath(marker.id);
-                                }}
-                            }});
-                        }}
-                    }}
-                }});
-                console.log('Added markers:', reachableCount, 'reachable out of', markerData.length);
-                markersAdded = true;
-            }}
-            
-            window.togglePath = function(nodeId) {{
-                if (!pathDataLoaded) {{
-                    console.log('Path data not loaded yet');
-                    return;
-                }}
-                
-                if (activePaths[nodeId]) {{
-                    window.myMap.removeLayer(activePaths[nodeId]);
-                    delete activePaths[nodeId];
-                }} else {{
-                    var data = pathData[nodeId];
-                    if (data) {{
-                        var pathLine = L.polyline(data.coords, {{
-                            color: 'green',
-                            weight: 4,
-                            opacity: 0.8,
-                        }}).bindTooltip("Node " + nodeId + "<br>Distance: " + data.distance.toFixed(2) + " km<br>Path: " + data.path_str, {{sticky: true}});
-                        pathLine.addTo(window.myMap);
-                        activePaths[nodeId] = pathLine;
-                    }}
-                }}
-            }};
-            
-            // Add markers after map loads
-            setTimeout(addMarkers, 100);
-        }});
-    </script>
-    """))
-
-    return m
-
-
-
-
-
+            if future.result(timeout=wait)[0] is None:
+                return None  # empty snapshot
+        except FutureTimeoutError:
+            raise JobPending(key)
+        except Exception as e:
+            print(f"Routing job {key} failed: {e}")
+            return None
+        result = registry.get(key)
+        if result is None:
+            return None
+    registry.touch(key)
+    result_cache.put(key, result)
+    return result
+
+
+def observe_job(future, labels):
+    """Record a finished routing job's stage timings, timed in the worker process"""
+    if not future.cancelled() and future.exception() is None:
+        future.result()[1].observe(labels)
+
+
+def result_labels(result):
+    """hour, range bucket and relay labels for stages serving a stored result"""
+    return query_labels(*result.query) if result.query is not None else query_labels()
+
+
+def load_result(key):
+    """Routing result named by a key embedded in a page, from any worker"""
+    result = result_cache.get(key)
+    if result is None:
+        result = registry.get(key)
+        if result is None:
+            abort(404)
+        result_cache.put(key, result)
+    return result
 
 
 app = Flask(__name__)
 
-# Global variables to store current session data
-current_path_data = {}
-current_points = []
-
-@app.route("/api/paths")
-def get_paths():
-    """API endpoint to return path data as JSON"""
-    return current_path_data
+# Most node ids accepted by one paths/batch request
+MAX_BATCH_PATHS = 500
+
+# Nodes whose paths are serialized together while streaming all paths
+PATH_STREAM_CHUNK = 256
+
+# Result URLs are content-addressed, so their responses never change
+RESULT_MAX_AGE = 24 * 60 * 60
+
+
+def result_etag(result, *parts):
+    """Validator for data derived from one routing result"""
+    return hashlib.sha1(repr((result.key,) + parts).encode()).hexdigest()[:20]
+
+
+def cacheable(response, etag):
+    """
+    Long-lived caching for responses under a content-addressed result URL.
+    Gzip bodies get their own validator, since they differ byte for byte
+    from the identity encoding.
+    """
+    if response.headers.get('Content-Encoding') == 'gzip':
+        etag += "-gz"
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = RESULT_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+def iter_path_json(result):
+    """Full path data as JSON text, built and yielded a chunk of nodes at a time"""
+    separator = '{'
+    trace = StageTrace()
+    for start in range(1, len(result.points), PATH_STREAM_CHUNK):
+        nodes = range(start, min(start + PATH_STREAM_CHUNK, len(result.points)))
+        with trace.stage('path_data'):
+            path_data = build_path_data(result.points, result.distances, result.fcc_names, nodes)
+            text = ','.join(f'"{id}":{json.dumps(data)}' for id, data in path_data.items())
+        if path_data:
+            yield separator + text
+            separator = ','
+    yield '{}' if separator == '{' else '}'
+    trace.observe(result_labels(result))
+
+
+def gzip_stream(chunks, level=6):
+    """Compress text chunks into a single gzip member as they are produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@app.route("/api/results/<key>/paths")
+def get_paths(key):
+    """All path data as JSON, streamed and gzip-compressed when accepted"""
+    profile = requested_format(request.headers, request.args)
+    if profile is not None:
+        # Built in full under the profiler rather than streamed
+        body, filename = profile_call(profile, f"paths-{key}", lambda: ''.join(iter_path_json(load_result(key))))
+        return Response(body, mimetype='application/json', headers={'X-Profile-File': filename})
+    result = load_result(key)
+    chunks = iter_path_json(result)
+    headers = {'Vary': 'Accept-Encoding'}
+    if request.accept_encodings.quality('gzip') > 0:
+        chunks = gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    response = Response(chunks, mimetype='application/json', headers=headers)
+    return cacheable(response, result_etag(result, 'all'))
+
+@app.route("/api/results/<key>/paths/<int:node_id>")
+def get_path(key, node_id):
+    """Path data for one node, reconstructed on demand"""
+    result = load_result(key)
+    if not 0 < node_id < len(result.points) or not result.distances.reachable(node_id):
+        abort(404)
+    with timed_stage('path_data', **result_labels(result)):
+        path_data = build_path_data(result.points, result.distances, result.fcc_names, [node_id])
+    return cacheable(app.json.response(path_data[node_id]), result_etag(result, node_id))
+
+@app.route("/api/results/<key>/paths/batch")
+def get_path_batch(key):
+    """Path data for ?ids=1,2,3 keyed by node id; unreachable ids are omitted"""
+    result = load_result(key)
+    try:
+        nodes = sorted({int(id) for id in request.args.get("ids", "").split(",") if id.strip()})
+    except ValueError:
+        abort(400, "ids must be a comma separated list of node ids")
+    if len(nodes) > MAX_BATCH_PATHS:
+        abort(400, f"at most {MAX_BATCH_PATHS} ids per request")
+    nodes = [id for id in nodes if 0 <= id < len(result.points)]
+    with timed_stage('path_data', **result_labels(result)):
+        path_data = build_path_data(result.points, result.distances, result.fcc_names, nodes)
+    return cacheable(app.json.response(path_data), result_etag(result, 'batch', tuple(nodes)))
+
+def parse_bbox(text):
+    """(west, south, east, north) from ?bbox=w,s,e,n, or None when absent"""
+    if not text:
+        return None
+    try:
+        west, south, east, north = (float(value) for value in text.split(","))
+    except ValueError:
+        abort(400, "bbox must be west,south,east,north in degrees")
+    if not all(map(math.isfinite, (west, south, east, north))) or south > north:
+        abort(400, "bbox must be west,south,east,north in degrees")
+    return west, south, east, north
+
+def request_wait():
+    """?wait= seconds to block on a job, clamped to [0, COMPUTE_WAIT]"""
+    try:
+        wait = float(request.args.get("wait", COMPUTE_WAIT))
+    except ValueError:
+        abort(400, "wait must be a number of seconds")
+    if math.isnan(wait):
+        abort(400, "wait must be a number of seconds")
+    return min(max(wait, 0.0), float(COMPUTE_WAIT))
+
+@app.route("/api/results/<key>/markers")
+def get_markers(key):
+    """
+    Map markers as GeoJSON, gzip-compressed when accepted; ?bbox=w,s,e,n
+    keeps only those inside the box (longitudes may run past 180)
+    """
+    result = load_result(key)
+    bbox = parse_bbox(request.args.get("bbox"))
+    with timed_stage('map_render', **result_labels(result)):
+        body = json.dumps(marker_features(result.points, result.distances, bbox), separators=(',', ':'))
+    chunks = [body]
+    headers = {'Vary': 'Accept-Encoding'}
+    if request.accept_encodings.quality('gzip') > 0:
+        chunks = gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    response = Response(chunks, mimetype='application/geo+json', headers=headers)
+    return cacheable(response, result_etag(result, 'markers', bbox))
+
+@app.route("/api/results/<key>/stations")
+def get_stations(key):
+    """
+    Nearest ground station (HQ or FCC relay) per balloon, from one
+    multi-source run made the first time a result's stations are asked for
+    """
+    result = load_result(key)
+    if result.query is None or not result.query[2]:
+        abort(404, "nearest-station routing needs relays enabled (jack=1)")
+    wait = request_wait()
+    if result.stations is None:
+        job = f"stations-{key}"
+        try:
+            stations = executor.call(job, compute_stations, result.points, result.query[1]).result(timeout=wait)
+        except FutureTimeoutError:
+            response = app.json.response({'status': 'pending', 'job': job})
+            response.status_code = 202
+            response.headers['Retry-After'] = '3'
+            return response
+        result.stations = stations
+        registry.put_stations(key, stations)
+    station_data = build_station_data(result.points, result.stations, result.fcc_names)
+    return cacheable(app.json.response(station_data), result_etag(result, 'stations'))
+
+def get_timeline(max_range, jack_enabled, wait=COMPUTE_WAIT):
+    """
+    Time-expanded graph over every available hour, oldest first. Raises
+    JobPending if it is still being computed after wait seconds.
+    """
+    snapshots = available_snapshots()[::-1]
+    if not snapshots:
+        return None
+    versions = ",".join(f"{hours}:{snapshot.version}" for hours, snapshot in snapshots)
+    key = "timeline-" + result_key(versions, -1, max_range, jack_enabled, relay_catalog.version)
+    timeline = timeline_cache.get(key)
+    if timeline is None:
+        future = executor.call(key, compute_timeline, snapshots, max_range, jack_enabled)
+        try:
+            timeline = future.result(timeout=wait)
+        except FutureTimeoutError:
+            raise JobPending(key)
+        timeline_cache.put(key, timeline)
+    return timeline
+
+@app.route("/api/timeline")
+def get_timeline_data():
+    """
+    Store-and-forward delivery to HQ across the hourly snapshots: per start
+    hour summary, plus ?start=<hours ago> for each balloon's earliest arrival
+    and &node=<balloon> for its carrier hand-offs
+    """
+    try:
+        max_range = float(request.args.get("value", 500))
+    except ValueError:
+        max_range = math.nan
+    if not 0 <= max_range <= MAX_RANGE_KM:  # also rejects NaN
+        abort(400, f"value must be a range from 0 to {MAX_RANGE_KM} km")
+    jack_enabled = request.args.get("jack", "0") == "1"
+    wait = request_wait()
+    try:
+        timeline = get_timeline(max_range, jack_enabled, wait)
+    except JobPending as pending:
+        response = app.json.response({'status': 'pending', 'job': pending.key})
+        response.status_code = 202
+        response.headers['Retry-After'] = '3'
+        response.headers['Link'] = f'</api/jobs/{pending.key}>; rel="monitor"'
+        return response
+    if timeline is None:
+        abort(503, "no snapshots available")
+
+    data = timeline.summary()
+    start = request.args.get("start", type=int)
+    if start is not None:
+        if start not in timeline.hours:
+            abort(404, f"no snapshot for hour {start}")
+        layer = timeline.layer(start)
+        balloons = np.nonzero(timeline.present[layer, :timeline.n_balloons])[0]
+        arrival = timeline.arrival[layer, balloons]
+        hours = np.asarray(timeline.hours)
+        data['start'] = start
+        # Balloon rows are node ids minus one (node 0 is HQ)
+        data['node'] = (balloons + 1).tolist()
+        data['arrival_hour'] = [None if t < 0 else int(hours[t]) for t in arrival.tolist()]
+        node = request.args.get("node", type=int)
+        if node is not None:
+            if not 0 < node <= timeline.n_balloons:
+                abort(404, f"no balloon {node}")
+            data['handoffs'] = [{'hour': hour, 'node': id + 1 if id < timeline.n_balloons else None,
+                                 'relay': id - timeline.n_balloons if id >= timeline.n_balloons else None}
+                                for hour, id in timeline.handoffs(start, node - 1)]
+    return data
+
+@app.route("/api/coverage")
+def get_coverage():
+    """
+    Balloons connected to HQ for every range up to the slider maximum, as
+    breakpoints: with range r, reachable[i] for the last range_km[i] below r
+    """
+    try:
+        hour = int(request.args.get("hour", 0))
+    except ValueError:
+        abort(400, "hour must be a whole number of hours ago")
+    if not 0 <= hour < len(valid_hours):
+        abort(404, f"no snapshot for hour {hour}")
+    jack_enabled = request.args.get("jack", "0") == "1"
+    wait = request_wait()
+    snapshot = snapshot_store.get(valid_hours[hour])
+    if snapshot is None or len(snapshot) == 0:
+        abort(503, "no snapshot available for this hour")
+    key = f"coverage-{snapshot.version}-{int(jack_enabled)}-{relay_catalog.version}"
+    curve = coverage_cache.get(key)
+    if curve is None:
+        try:
+            curve = executor.call(key, compute_coverage, snapshot, jack_enabled).result(timeout=wait)
+        except FutureTimeoutError:
+            response = app.json.response({'status': 'pending', 'job': key})
+            response.status_code = 202
+            response.headers['Retry-After'] = '3'
+            return response
+        coverage_cache.put(key, curve)
+    response = app.json.response(curve.as_dict())
+    response.set_etag(key)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route("/api/metrics")
+def get_metrics_cube():
+    """
+    Sidebar metrics precomputed for every hour and range bucket, so the
+    sliders can preview them without routing; ?hour=&value= selects one
+    bucket. While a changed snapshot is rebuilt the previous cube is served
+    with stale=true; before the first build finishes the answer is 202.
+    """
+    jack_enabled = request.args.get("jack", "0") == "1"
+    cube, pending = refresh_metrics_cube(jack_enabled)
+    if cube is None:
+        if pending is None:
+            abort(503, "no snapshots available")
+        response = app.json.response({'status': 'pending', 'job': pending})
+        response.status_code = 202
+        response.headers['Retry-After'] = '3'
+        return response
+
+    hour = request.args.get("hour", type=int)
+    if hour is None:
+        data = cube.as_dict()
+    else:
+        max_range = request.args.get("value", 500, type=float)
+        metrics = cube.metrics(hour, max_range)
+        if metrics is None:
+            abort(404, f"no metrics for hour {hour}")
+        data = {'key': cube.key, 'hour': hour, 'range_km': float(cube.ranges[cube.bucket(max_range)]),
+                'metrics': metrics}
+    data['stale'] = pending is not None
+    response = app.json.response(data)
+    response.set_etag(f"{cube.key}-{int(pending is not None)}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route("/api/cache")
+def get_cache_stats():
+    """Hit/miss counters for the routing result cache"""
+    return result_cache.stats()
+
+@app.route("/api/jobs")
+def get_job_stats():
+    """Routing job counters for the compute executor"""
+    return executor.stats()
+
+@app.route("/metrics")
+def get_metrics():
+    """Per-stage latency histograms in the Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route("/api/jobs/<key>")
+def get_job(key):
+    """State of the routing job for a result key: pending, done, failed or unknown"""
+    status = DONE if key in result_cache or registry.touch(key) else executor.status(key)
+    return {'key': key, 'status': status}
 
 @app.route("/")
 def index():
-    global current_path_data, current_points
-    
     max_range = int(request.args.get("value", 500))
     hour_value = int(request.args.get("hour", 0))
     jack_enabled = request.args.get("jack", "0") == "1"
 
-    points, distances, fcc_start = get_distances(max_range, hour_value, jack_enabled)
-    if(len(points) == 0):
+    profile = requested_format(request.headers, request.args)
+    if profile is not None:
+        # Route in this thread rather than a worker process, so the profile
+        # covers the graph build and Dijkstra as well as the page
+        response, filename = profile_call(profile, f"index-h{hour_value}-r{max_range}-j{int(jack_enabled)}",
+                                          index_page, max_range, hour_value, jack_enabled, 0, True)
+        response = app.make_response(response)
+        response.headers['X-Profile-File'] = filename
+        return response
+    return index_page(max_range, hour_value, jack_enabled, request_wait())
+
+def index_page(max_range, hour_value, jack_enabled, wait, inline=False):
+    try:
+        result = get_result(hour_value, max_range, jack_enabled, wait, inline)
+    except JobPending as pending:
+        # Answer now and let the page poll by reloading until the job is done
+        response = app.make_response((render_template("index.html",
+                               map_html="",
+                               initial_value=max_range,
+                               initial_hour=hour_value,
+                               error_message="Still computing the network for these settings, this page will refresh automatically.",
+                               refresh_after=3,
+                               jack_enabled=jack_enabled), 202))
+        response.headers['Retry-After'] = '3'
+        response.headers['Link'] = f'</api/jobs/{pending.key}>; rel="monitor"'
+        return response
+    if result is None:
          return render_template("index.html",
                                map_html="",
                                initial_value=max_range,
@@ -320,95 +524,11 @@ def index():
                                error_message="Error in loading JSON data for specified hour, try again later or try with different hour.",
                                jack_enabled=jack_enabled)
     
-    # Store data globally for API access
-    current_points = points
-    current_path_data = {}
-    
-    # Load FCC facility names for better path descriptions
-    fcc_facility_names = {}
-    if fcc_start >= 0:
-        with open("fcc_facilities.json", "r") as f:
-            fcc_facilities = json.load(f)
-        for i, facility in enumerate(fcc_facilities):
-            facility_id = fcc_start + i
-            # Extract short name from location
-            short_name = facility['name'].split(' - ')[0]  # e.g. "New York, NY"
-            fcc_facility_names[facility_id] = f"{facility['type']} ({short_name})"
-    
-    for i, (lat, lon, alt, id) in enumerate(points):
-        if id == 0 or len(distances[id][0]) == 0:
-            continue
-        path_coords = [[points[n][0], points[n][1]] for n in distances[id][0] + [id]]
-        path_nodes = distances[id][0] + [id]
-        
-        # Create descriptive path string
-        path_labels = []
-        for n in path_nodes:
-            if n == 0:
-                path_labels.append("HQ")
-            elif n in fcc_facility_names:
-                path_labels.append(fcc_facility_names[n])
-            else:
-                path_labels.append(f"Satellite {n}")
-        
-        path_str = " > ".join(path_labels)
-        current_path_data[id] = {
-            'coords': path_coords,
-            'distance': distances[id][1],
-            'path_str': path_str,
-            'lat': lat,
-            'lon': lon
-        }
-    
-    m = add_markers(points, distances, fcc_start)
-
-    # Save or display
-    map_html = m._repr_html_()
-    
-    # Calculate network performance metrics
-    total_satellites = len([p for p in points if p[3] != 0 and (fcc_start == -1 or p[3] < fcc_start)])
-    total_fcc_relays = len([p for p in points if fcc_start != -1 and p[3] >= fcc_start])
-    reachable_satellites = len([id for id in current_path_data.keys() if id != 0 and (fcc_start == -1 or id < fcc_start)])
-    
-    # Calculate average hop count
-    if current_path_data:
-        hop_counts = [len(data['coords']) - 1 for data in current_path_data.values()]
-        avg_hops = sum(hop_counts) / len(hop_counts)
-        max_hops = max(hop_counts) if hop_counts else 0
-        min_hops = min(hop_counts) if hop_counts else 0
-    else:
-        avg_hops = max_hops = min_hops = 0
-    
-    # Calculate network coverage percentage
-    coverage_percent = (reachable_satellites / total_satellites * 100) if total_satellites > 0 else 0
-    
-    # Find longest and shortest distances
-    if current_path_data:
-        distances_km = [data['distance'] for data in current_path_data.values()]
-        max_distance = max(distances_km) if distances_km else 0
-        min_distance = min(distances_km) if distances_km else 0
-        avg_distance = sum(distances_km) / len(distances_km) if distances_km else 0
-    else:
-        max_distance = min_distance = avg_distance = 0
-    
-    network_metrics = {
-        'total_satellites': total_satellites,
-        'total_fcc_relays': total_fcc_relays,
-        'reachable_satellites': reachable_satellites,
-        'coverage_percent': round(coverage_percent, 1),
-        'avg_hops': round(avg_hops, 1),
-        'max_hops': max_hops,
-        'min_hops': min_hops,
-        'max_distance': round(max_distance, 1),
-        'min_distance': round(min_distance, 1),
-        'avg_distance': round(avg_distance, 1)
-    }
-    
-    # Debug: Check HTML size and distances
-    html_lines = len(map_html.split('\n'))
-    print(f"Generated HTML has {html_lines} lines, {total_satellites} satellites, {reachable_satellites} reachable")
-    
-    return render_template("index.html", map_html=map_html, initial_value=max_range, initial_hour=hour_value, error_message=None, jack_enabled=jack_enabled, metrics=network_metrics)
+    # The map shell is the same for every result; it loads markers and paths
+    # for the result key the page defines
+    network_metrics = result.metrics
+    with timed_stage('template_render', **query_labels(hour_value, max_range, jack_enabled)):
+        return render_template("index.html", map_html=map_shell(), result_key=result.key, initial_value=max_range, initial_hour=hour_value, error_message=None, jack_enabled=jack_enabled, metrics=network_metrics)
 
 if __name__ == "__main__":
     app.run(debug=True, port=5001)
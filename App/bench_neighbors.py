@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark neighbor search strategies against the scalar distance_3d scan
+the app used originally. tests/test_neighbors.py checks that they agree.
+
+Usage: python bench_neighbors.py [max_distance_km]
+"""
+
+import random
+import sys
+import time
+
+from geometry import distance_3d
+from neighbors import dense_neighbor_lists, grid_neighbor_lists
+
+SIZES = [10, 25, 50, 100, 250, 500, 1000, 2000]
+
+
+def random_points(n, seed=0):
+    rng = random.Random(seed)
+    points = [[37.419, -122.106, 0, 0]]
+    for i in range(1, n):
+        points.append([rng.uniform(-90, 90), rng.uniform(-180, 180), rng.uniform(0, 25), i])
+    return points
+
+
+def scalar_neighbor_lists(points, max_distance):
+    """Original O(n^2) loop calling distance_3d for every ordered pair."""
+    res = [[] for point in points]
+    for point1 in points:
+        for point2 in points:
+            if(point1[3] == point2[3]):
+                continue
+            dis = distance_3d(point1, point2)
+            if(dis < max_distance):
+                res[point1[3]].append((point2[3], dis))
+    return res
+
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    max_distance = float(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f"max_distance = {max_distance} km")
+    print(f"{'n':>6} {'scalar (ms)':>12} {'dense (ms)':>12} {'grid (ms)':>12} {'vs scalar':>10}")
+    crossover = None
+    for n in SIZES:
+        points = random_points(n)
+        scalar_time, _ = best_of(lambda: scalar_neighbor_lists(points, max_distance))
+        dense_time, _ = best_of(lambda: dense_neighbor_lists(points, max_distance))
+        grid_time, _ = best_of(lambda: grid_neighbor_lists(points, max_distance))
+        if crossover is None and grid_time < dense_time:
+            crossover = n
+        print(f"{n:>6} {scalar_time * 1000:>12.2f} {dense_time * 1000:>12.2f} "
+              f"{grid_time * 1000:>12.2f} {scalar_time / min(dense_time, grid_time):>9.1f}x")
+    print(f"Grid search beats dense blocks from n={crossover}" if crossover
+          else "Grid search never beats dense blocks in this range")
+
+
+if __name__ == "__main__":
+    main()
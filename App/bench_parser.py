@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark the single-pass treasure parser against the old json.loads +
+line-by-line sanitize fallback on large synthetic payloads.
+
+Usage: python bench_parser.py [rows]
+"""
+
+import json
+import random
+import re
+import sys
+import time
+
+from geometry import lat_lon_alt
+from treasure_parser import parse_rows
+
+
+def synthetic_payload(rows, corrupt_fraction=0.0, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(rows):
+        lat, lon, alt = rng.uniform(-90, 90), rng.uniform(-180, 180), rng.uniform(0, 25)
+        r = rng.random()
+        if r < corrupt_fraction / 3:
+            lines.append(f"  [NaN, {lon}, {alt}]")
+        elif r < corrupt_fraction * 2 / 3:
+            lines.append(f"  [{lat}, Infinity, {alt}]")
+        elif r < corrupt_fraction:
+            lines.append(f"  [{lat}, {lon}")  # truncated row
+        else:
+            lines.append(f"  [{lat}, {lon}, {alt}]")
+    return "[\n" + ",\n".join(lines) + "\n]"
+
+
+def legacy_parse(text):
+    """
+    The old get_coordinates path: json.loads, then sanitize and re-parse,
+    then convert the row lists to an array.
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        lines = text.strip().splitlines()
+        array_lines = [line.strip() for line in lines if line.strip().startswith('[') and line.strip().endswith(']')]
+        array_lines = [re.sub(r'\b(NaN|Infinity|-Infinity)\b', 'null', line) for line in array_lines]
+        fixed_json = "[\n" + ",\n".join(array_lines) + "\n]"
+        try:
+            data = json.loads(fixed_json)
+        except json.JSONDecodeError:
+            data = []
+    return lat_lon_alt(data)
+
+
+def timed_legacy(text):
+    try:
+        return best_of(lambda: legacy_parse(text))
+    except RecursionError:
+        # Truncated rows nest the brackets deep enough to crash json.loads
+        return None, None
+
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"{rows} rows")
+    print(f"{'payload':>14} {'legacy (ms)':>12} {'parser (ms)':>12} {'speedup':>8} "
+          f"{'legacy rows':>12} {'parser rows':>12} {'flagged':>8}")
+    for label, fraction in [("clean", 0.0), ("0.1% corrupt", 0.001), ("5% corrupt", 0.05)]:
+        text = synthetic_payload(rows, fraction)
+        legacy_time, legacy = timed_legacy(text)
+        parser_time, (coords, errors) = best_of(lambda: parse_rows(text))
+        # The legacy fallback drops every line ending in "," so it recovers
+        # almost nothing from a corrupted multi-line payload
+        if legacy is None:
+            legacy_ms, speedup, legacy_rows = "crashed", "-", "-"
+        else:
+            legacy_ms = f"{legacy_time * 1000:.1f}"
+            speedup = f"{legacy_time / parser_time:.1f}x"
+            legacy_rows = len(legacy)
+        print(f"{label:>14} {legacy_ms:>12} {parser_time * 1000:>12.1f} {speedup:>8} "
+              f"{legacy_rows:>12} {len(coords) - len(errors):>12} {len(errors):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmark each stage of the routing pipeline on synthetic constellations,
+without the treasure API.
+
+synthetic_constellation() generates a seeded balloon snapshot: most
+balloons drift in clusters stretched east-west along the jet-stream
+latitudes at stratospheric altitudes, the rest are scattered, climbing or
+descending, and a few rows are corrupt as in real payloads. Every stage
+the page and its API calls run is timed at each size: payload parse, point
+set, candidate graph build, routing, path serialization, sidebar metrics
+and map markers.
+
+Results can be written as JSON and compared against a saved baseline run;
+stages that got slower than the tolerance are reported and make the exit
+status non-zero, so the script can gate a change.
+
+Sizes up to 10^6 work, but the candidate graph grows with the square of
+the local density, so large sizes need a smaller range (e.g.
+--sizes 1000000 --range 20).
+
+Usage: python bench_pipeline.py [--sizes 100,1000,10000,100000] [--range 100]
+                                [--relays] [--repeat 3] [--seed 0]
+                                [--output results.json] [--baseline baseline.json]
+                                [--tolerance 0.25]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from network import RangeGraph
+from pipeline import (build_path_data, build_point_set, compute_metrics, get_fcc_facility_names,
+                      ground_stations, marker_features)
+from routing import dijkstra, multi_source_dijkstra
+from snapshots import Snapshot
+from treasure_parser import parse_rows
+
+SIZES = [100, 1000, 10000, 100000]
+STAGES = ['parse', 'point_set', 'graph_build', 'routing', 'stations', 'path_json', 'metrics', 'markers']
+
+# Stages faster than this are not flagged, whatever their ratio to the baseline
+NOISE_FLOOR_MS = 1.0
+
+
+def synthetic_constellation(n, seed=0, clusters=40, scattered=0.2, corrupt=0.001):
+    """
+    (n, 3) [lat, lon, alt] rows resembling a treasure snapshot. Clustered
+    balloons sit 15-21 km up around centres in both hemispheres' westerly
+    belts; the scattered ones are spread uniformly over the sphere at any
+    altitude from 0 to 25 km. Corrupt rows are NaN, as parse_rows keeps them.
+    """
+    rng = np.random.default_rng(seed)
+    centre_lat = rng.choice([-1, 1], clusters) * rng.uniform(20, 60, clusters)
+    centre_lon = rng.uniform(-180, 180, clusters)
+    member = rng.integers(0, clusters, n)
+    lat = centre_lat[member] + rng.normal(0, 3, n)
+    lon = centre_lon[member] + rng.normal(0, 12, n) / np.cos(np.radians(centre_lat[member]))
+    alt = np.clip(rng.normal(18, 1.5, n), 0, 25)
+
+    spread = rng.random(n) < scattered
+    lat[spread] = np.degrees(np.arcsin(rng.uniform(-1, 1, spread.sum())))
+    lon[spread] = rng.uniform(-180, 180, spread.sum())
+    alt[spread] = rng.uniform(0, 25, spread.sum())
+
+    coords = np.column_stack((np.clip(lat, -90, 90), (lon + 180) % 360 - 180, alt))
+    coords[rng.random(n) < corrupt] = np.nan
+    return coords
+
+
+def synthetic_payload(coords):
+    """Treasure-style JSON text for coords; NaN rows come out as NaN tokens"""
+    return "[\n" + ",\n".join(f"  [{lat}, {lon}, {alt}]" for lat, lon, alt in coords.tolist()) + "\n]"
+
+
+def synthetic_snapshot(n, seed=0, hours="00"):
+    return Snapshot(hours, synthetic_constellation(n, seed), f"synthetic-{n}-{seed}")
+
+
+def path_json(points, distances, fcc_names, chunk=1000):
+    """All path data as JSON text, a chunk of nodes at a time like /api/results/<key>/paths"""
+    parts = []
+    for start in range(1, len(points), chunk):
+        nodes = range(start, min(start + chunk, len(points)))
+        path_data = build_path_data(points, distances, fcc_names, nodes)
+        parts.extend(f'"{id}":{json.dumps(data)}' for id, data in path_data.items())
+    return '{' + ','.join(parts) + '}'
+
+
+def timed(fn, repeat):
+    """Run fn repeat times; returns the timings in ms and the last result"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times, result
+
+
+def bench_size(n, max_range, jack_enabled, repeat, seed):
+    """Timings for every stage at one size, keyed by stage name"""
+    snapshot = synthetic_snapshot(n, seed)
+    payload = synthetic_payload(snapshot.coords)
+    runs = {}
+    runs['parse'], _ = timed(lambda: parse_rows(payload), repeat)
+    runs['point_set'], points = timed(lambda: build_point_set(snapshot.coords, jack_enabled, max_range), repeat)
+    runs['graph_build'], graph = timed(lambda: RangeGraph(points, max_range), repeat)
+    runs['routing'], distances = timed(lambda: dijkstra(graph.neighbors(max_range)), repeat)
+    if jack_enabled:
+        stations = ground_stations(points)
+        runs['stations'], _ = timed(lambda: multi_source_dijkstra(graph.neighbors(max_range), stations), repeat)
+    fcc_names = get_fcc_facility_names(points)
+    runs['path_json'], text = timed(lambda: path_json(points, distances, fcc_names), repeat)
+    runs['metrics'], metrics = timed(lambda: compute_metrics(points, distances, points.fcc_start), repeat)
+    runs['markers'], _ = timed(lambda: json.dumps(marker_features(points, distances)), repeat)
+
+    results = {}
+    for stage in STAGES:
+        if stage in runs:
+            results[stage] = {'best_ms': round(min(runs[stage]), 3),
+                              'median_ms': round(statistics.median(runs[stage]), 3)}
+    info = {'nodes': len(points), 'edges': graph.edge_count(max_range),
+            'reachable': metrics['reachable_satellites'], 'path_json_bytes': len(text)}
+    return results, info
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print every stage against the baseline; returns the stages that are
+    more than tolerance slower, as "size/stage" names.
+    """
+    regressions = []
+    print(f"\nAgainst baseline from {baseline.get('environment', {}).get('time', '?')}:")
+    print(f"{'size':>8} {'stage':<12} {'base (ms)':>10} {'now (ms)':>10} {'ratio':>7}")
+    for size, stages in results['sizes'].items():
+        base_stages = baseline.get('sizes', {}).get(size)
+        if base_stages is None:
+            continue
+        for stage, timing in stages.items():
+            if stage not in base_stages:
+                continue
+            base, now = base_stages[stage]['best_ms'], timing['best_ms']
+            ratio = now / base if base > 0 else float('inf')
+            slower = ratio > 1 + tolerance and now - base > NOISE_FLOOR_MS
+            if slower:
+                regressions.append(f"{size}/{stage}")
+            print(f"{size:>8} {stage:<12} {base:>10.2f} {now:>10.2f} {ratio:>6.2f}x"
+                  f"{'  SLOWER' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the routing pipeline stages.")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in SIZES),
+                        help="comma-separated balloon counts")
+    parser.add_argument("--range", type=float, default=100, dest="max_range", help="km")
+    parser.add_argument("--relays", action="store_true", help="include the FCC relays")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown against the baseline, as a fraction")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = {
+        'environment': environment(),
+        'config': {'range_km': args.max_range, 'relays': args.relays, 'repeat': args.repeat,
+                   'seed': args.seed},
+        'sizes': {},
+        'info': {},
+    }
+    print(f"range {args.max_range:g} km, relays {'on' if args.relays else 'off'}, "
+          f"best of {args.repeat}")
+    print(f"{'size':>8} {'edges':>10} " + " ".join(f"{stage:>11}" for stage in STAGES))
+    for n in sizes:
+        stages, info = bench_size(n, args.max_range, args.relays, args.repeat, args.seed)
+        results['sizes'][str(n)] = stages
+        results['info'][str(n)] = info
+        print(f"{n:>8} {info['edges']:>10} " + " ".join(
+            f"{stages[stage]['best_ms']:>11.2f}" if stage in stages else f"{'-':>11}" for stage in STAGES))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline.get('config') != results['config']:
+            print(f"Warning: baseline config {baseline.get('config')} differs from {results['config']}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} stages slower than the baseline: {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
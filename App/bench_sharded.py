@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark the process-sharded neighbor search against the single-process
+grid search on a large synthetic snapshot, checking the edges are identical.
+
+Reports the pair-search time and speedup for each worker count, and the
+end-to-end adjacency build (pair search plus to_neighbor_lists).
+
+Usage: python bench_sharded.py [points] [max_distance_km] [max_workers]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from geometry import ecef
+from neighbors import grid_pairs, to_neighbor_lists
+from sharded_neighbors import sharded_grid_pairs, shutdown_pools
+
+
+def random_xyz(n, seed=0):
+    """Balloon-like positions: uniform over the sphere, 0-25 km altitude."""
+    rng = np.random.default_rng(seed)
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    lon = rng.uniform(-180, 180, n)
+    alt = rng.uniform(0, 25, n)
+    return ecef(lat, lon, alt)
+
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def worker_counts(max_workers):
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    max_distance = float(sys.argv[2]) if len(sys.argv) > 2 else 200
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else max(8, os.cpu_count() or 1)
+
+    xyz = random_xyz(n)
+    serial_time, expected = best_of(lambda: grid_pairs(xyz, max_distance))
+    list_time, _ = best_of(lambda: to_neighbor_lists(n, *expected), repeat=1)
+    print(f"{n} points, range {max_distance:g} km, {len(expected[0])} directed edges, "
+          f"{os.cpu_count()} CPUs available")
+    print(f"single process: pairs {serial_time * 1000:.0f} ms, "
+          f"adjacency lists {list_time * 1000:.0f} ms")
+    print(f"{'workers':>7} {'pairs ms':>9} {'speedup':>8} {'total ms':>9} {'speedup':>8}")
+
+    try:
+        for workers in worker_counts(max_workers):
+            sharded_grid_pairs(xyz, max_distance, workers)  # start the pool outside the timing
+            sharded_time, pairs = best_of(lambda: sharded_grid_pairs(xyz, max_distance, workers))
+            if any(not np.array_equal(a, b) for a, b in zip(pairs, expected)):
+                raise SystemExit(f"sharded result with {workers} workers differs from grid_pairs")
+            total = sharded_time + list_time
+            print(f"{workers:>7} {sharded_time * 1000:>9.0f} {serial_time / sharded_time:>7.2f}x "
+                  f"{total * 1000:>9.0f} {(serial_time + list_time) / total:>7.2f}x")
+    finally:
+        shutdown_pools()
+
+
+if __name__ == "__main__":
+    main()
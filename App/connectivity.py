@@ -0,0 +1,135 @@
+"""
+Connected components of the satellite neighbor graph.
+
+Reachability questions ("which nodes can talk to HQ at all") do not need
+shortest paths, only component membership, which is computed here directly
+from the (src, dst) edge arrays without building adjacency lists. Sweeping
+edges in length order through a union-find gives the answer for every range
+at once.
+"""
+
+import numpy as np
+
+
+def connected_components(n: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Component label per node: the smallest node id in its component.
+
+    Vectorized hook-and-jump: every edge hooks the root with the larger id
+    under the one with the smaller id, then trees are flattened by pointer
+    jumping, until all edges join nodes with the same root.
+    """
+    parent = np.arange(n)
+    if len(src) == 0:
+        return parent
+    src = np.asarray(src)
+    dst = np.asarray(dst)
+    while True:
+        a = parent[src]
+        b = parent[dst]
+        split = a != b
+        if not split.any():
+            return parent
+        a, b = a[split], b[split]
+        np.minimum.at(parent, np.maximum(a, b), np.minimum(a, b))
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+
+class UnionFind:
+    """
+    Disjoint sets over nodes 0..n-1 with union by size and path halving.
+    """
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, node: int) -> int:
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, a: int, b: int) -> int:
+        """
+        Merge the sets of a and b; returns the root of the merged set.
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+    def component_sizes(self) -> dict:
+        """
+        Root -> size for every component.
+        """
+        return {node: self.size[node] for node in range(len(self.parent)) if self.parent[node] == node}
+
+
+class CoverageCurve:
+    """
+    How many balloons share HQ's component as the range grows, as a step
+    function: with any range r, counts[i] balloons are reachable where i is
+    the last threshold strictly below r (edges are usable when shorter than
+    the range, as in neighbor_lists).
+    """
+
+    def __init__(self, thresholds: np.ndarray, counts: np.ndarray, total: int):
+        self.thresholds = thresholds
+        self.counts = counts
+        self.total = total
+
+    def reachable(self, max_range: float) -> int:
+        i = int(np.searchsorted(self.thresholds, max_range, side='left')) - 1
+        return int(self.counts[i]) if i >= 0 else 0
+
+    def coverage_percent(self, max_range: float) -> float:
+        return self.reachable(max_range) / self.total * 100 if self.total else 0.0
+
+    def approx_bytes(self) -> int:
+        return self.thresholds.nbytes + self.counts.nbytes
+
+    def as_dict(self) -> dict:
+        return {
+            'range_km': self.thresholds.tolist(),
+            'reachable': self.counts.tolist(),
+            'total': self.total,
+        }
+
+
+def coverage_curve(n: int, src: np.ndarray, dst: np.ndarray, length: np.ndarray,
+                   counted: np.ndarray, hub: int = 0) -> CoverageCurve:
+    """
+    One sweep over edges sorted by length, joining endpoints with a
+    union-find. Records a breakpoint each time the hub's component gains
+    counted nodes (balloons), so coverage for every range comes from a single
+    pass instead of one Dijkstra per range.
+    """
+    forward = src < dst  # each undirected edge is stored in both directions
+    uf = UnionFind(n)
+    weight = counted.astype(np.int64).tolist()
+    thresholds = []
+    counts = []
+    hub_weight = weight[hub]
+    for a, b, d in zip(src[forward].tolist(), dst[forward].tolist(), length[forward].tolist()):
+        ra, rb = uf.find(a), uf.find(b)
+        if ra == rb:
+            continue
+        root = uf.union(ra, rb)
+        merged = weight[ra] + weight[rb]
+        weight[root] = merged
+        if uf.find(hub) == root and merged != hub_weight:
+            hub_weight = merged
+            thresholds.append(d)
+            counts.append(merged)
+    return CoverageCurve(np.array(thresholds, dtype=np.float64), np.array(counts, dtype=np.int64),
+                         int(counted.sum()))
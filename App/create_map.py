@@ -2,34 +2,18 @@ import requests
 import folium
 from folium import IFrame
 from folium import Element
-import geopandas as gpd
-from shapely.geometry import Point
 import time
 import json
 import re
 import math
 import heapq
+from landmask import get_land_mask
+from neighbors import neighbor_lists
 
-def distance_3d(point1,point2):
-    def to_xyz(lat, lon, alt_km):
-        R = 6371 + alt_km  # Earth radius + altitude
-        lat_rad = math.radians(lat)
-        lon_rad = math.radians(lon)
-        x = R * math.cos(lat_rad) * math.cos(lon_rad)
-        y = R * math.cos(lat_rad) * math.sin(lon_rad)
-        z = R * math.sin(lat_rad)
-        return x, y, z
-
-    x1, y1, z1 = to_xyz(point1[0],point1[1], point1[2])
-    x2, y2, z2 = to_xyz(point2[0],point2[1], point2[2])
-    return math.sqrt((x1 - x2)**2 + (y1 - y2)**2 + (z1 - z2)**2)
-
-# Load land polygons from Natural Earth
-land = gpd.read_file("natural_earth_land/ne_110m_land.shp")
 
 def is_on_land(lat, lon):
-    point = Point(lon, lat)
-    return any(land.geometry.contains(point))
+    # Precompiled Natural Earth land mask, memory-mapped on first call
+    return bool(get_land_mask().contains(lat, lon))
 
 
 
@@ -80,15 +64,7 @@ for point in points:
 
 
 def calculate_distance(max_distance = 1000):
-    res = [[] for point in points]
-    for point1 in points:
-        for point2 in points:
-            if(point1[3] == point2[3]):
-                continue
-            dis = distance_3d(point1, point2)
-            if(dis < max_distance):
-                res[point1[3]].append((point2[3],dis))
-    return res
+    return neighbor_lists(points, max_distance)
 
 
 neighbor_arr = calculate_distance()
@@ -67,6 +67,10 @@ pip install -q -r requirements.txt
 print_status "📡 Generating FCC facility data..."
 python3 fetch_fcc_data.py
 
+# Precompile the Natural Earth land mask (memory-mapped by the app)
+print_status "🗺️ Precompiling Natural Earth land mask..."
+python3 landmask.py
+
 # Download and setup ngrok
 print_status "🌐 Setting up ngrok tunnel..."
 if [ ! -f "ngrok" ]; then
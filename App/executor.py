@@ -0,0 +1,187 @@
+"""
+Routing jobs run outside the request thread.
+
+Building the point set, the range graph and the shortest paths is CPU-bound
+Python, so a large snapshot would hold a Flask worker (and the GIL) for
+seconds. ComputeExecutor runs pipeline.compute_result in a pool of worker
+processes instead. A job hands its result back through the ResultRegistry
+rather than pickling it, and identical jobs submitted while one is already
+running share the same future.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, Tuple
+
+from registry import REGISTRY_PATH, ResultRegistry
+from telemetry import StageTrace
+
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+UNKNOWN = 'unknown'
+
+
+class JobPending(Exception):
+    """
+    Raised when a routing job is still running after the caller's wait.
+    """
+
+    def __init__(self, key: str):
+        super().__init__(key)
+        self.key = key
+
+
+def _failed(future: Future) -> bool:
+    return future.done() and (future.cancelled() or future.exception() is not None)
+
+
+# One registry connection per worker process, opened on first use
+_worker_registry: Optional[ResultRegistry] = None
+
+
+def run_job(registry_path: str, key: str, snapshot, hour: int, max_range,
+            jack_enabled: bool) -> Tuple[Optional[str], StageTrace]:
+    """
+    Compute and register one routing result; returns its key, or None if
+    the snapshot is empty, and the job's stage timings. Runs in a worker
+    process.
+    """
+    global _worker_registry
+    from pipeline import compute_result
+
+    trace = StageTrace()
+    if _worker_registry is None or _worker_registry.path != registry_path:
+        _worker_registry = ResultRegistry(registry_path)
+    if _worker_registry.touch(key):
+        return key, trace  # another Flask worker already computed it
+    result = compute_result(snapshot, max_range, jack_enabled, key, trace)
+    if result is None:
+        return None, trace
+    with trace.stage('register'):
+        _worker_registry.put(result, hour, max_range, jack_enabled, snapshot.version)
+    return key, trace
+
+
+def _init_worker(shard_workers: int):
+    from sharded_neighbors import set_default_workers
+
+    # Each compute worker shards over its share of the cores, so the pools
+    # together never fork more processes than there are cores
+    set_default_workers(shard_workers)
+
+
+def _warm_up() -> int:
+    import pipeline  # noqa: F401  (import the heavy modules once per worker)
+    return os.getpid()
+
+
+class ComputeExecutor:
+    """
+    Process pool for routing jobs with in-flight deduplication by result key.
+
+    Workers are forked eagerly by start(), before the app launches its
+    background threads. Where fork is unavailable jobs run on a thread pool,
+    which still keeps them off the request path.
+    """
+
+    def __init__(self, registry_path: str = REGISTRY_PATH, workers: int = DEFAULT_WORKERS):
+        self.registry_path = registry_path
+        self.workers = workers
+        self.submitted = 0
+        self.deduplicated = 0
+        self._jobs = {}  # key -> Future, while running and for failed jobs
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _make_pool(self):
+        if 'fork' in multiprocessing.get_all_start_methods():
+            shard_workers = max(1, (os.cpu_count() or 1) // self.workers)
+            return ProcessPoolExecutor(max_workers=self.workers,
+                                       mp_context=multiprocessing.get_context('fork'),
+                                       initializer=_init_worker, initargs=(shard_workers,))
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="compute")
+
+    def start(self):
+        with self._lock:
+            if self._pool is not None:
+                return
+            self._pool = self._make_pool()
+            pool = self._pool
+        # ProcessPoolExecutor forks all its workers on the first submit
+        pool.submit(_warm_up).result()
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, key: str, snapshot, hour: int, max_range, jack_enabled: bool,
+               on_done: Optional[Callable[[Future], None]] = None) -> Future:
+        """
+        Future resolving to (result key, StageTrace) once the result is in the
+        registry. A job for a key that is already running returns the running
+        job's future.
+        """
+        return self.call(key, run_job, self.registry_path, key, snapshot, hour, max_range, jack_enabled,
+                         on_done=on_done)
+
+    def call(self, key: str, fn, *args, on_done: Optional[Callable[[Future], None]] = None) -> Future:
+        """
+        Run fn(*args) in the pool, deduplicated by key like submit(). fn must
+        be a module-level function; its return value is pickled back.
+        on_done is called with the future when a newly started job finishes,
+        not for calls that joined a running one.
+        """
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is not None and not _failed(future):
+                self.deduplicated += 1
+                return future
+            if self._pool is None:
+                self._pool = self._make_pool()
+            try:
+                future = self._pool.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                self._pool = self._make_pool()
+                future = self._pool.submit(fn, *args)
+            self._jobs[key] = future
+            self.submitted += 1
+        future.add_done_callback(lambda done: self._finished(key, done))
+        if on_done is not None:
+            future.add_done_callback(on_done)
+        return future
+
+    def _finished(self, key: str, future: Future):
+        # Successful jobs are found through the registry from now on; failed
+        # ones stay visible to status() until resubmitted
+        if not _failed(future):
+            with self._lock:
+                if self._jobs.get(key) is future:
+                    del self._jobs[key]
+
+    def status(self, key: str) -> str:
+        with self._lock:
+            future = self._jobs.get(key)
+        if future is None:
+            return UNKNOWN
+        if not future.done():
+            return PENDING
+        return FAILED if _failed(future) else DONE
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = sum(1 for future in self._jobs.values() if not future.done())
+            return {
+                'workers': self.workers,
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'running': running,
+            }
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Streaming ingest of an FCC Antenna Structure Registration (ASR) dump into a
+memory-mappable relay file.
+
+The dump is read from a local '|'-delimited file whose first line names the
+columns, a block of rows at a time, so memory stays bounded by the block
+size however many millions of structures it holds. Each block is converted
+to arrays and filtered with the filter_facilities rules (minimum height,
+suitable facility type, valid coordinates) in one vectorized pass, and the
+kept rows are appended to a temporary file. The result is written as one
+structured .npy array with the ECEF positions and node labels precomputed,
+which RelayCatalog memory-maps at startup instead of parsing JSON.
+
+Recognised columns: callsign, lat, lon, structure_height (feet),
+facility_type, location. Coordinates may instead be given in the ASR
+degrees/minutes/seconds form as lat_deg, lat_min, lat_sec, lat_dir and
+lon_deg, lon_min, lon_sec, lon_dir.
+
+Usage: python fcc_ingest.py DUMP [--output fcc_relays.npy] [--min-height 150]
+                            [--block-rows 100000]
+       python fcc_ingest.py --synthetic ROWS DUMP   (write a test dump)
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from geometry import ecef
+
+RELAY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fcc_relays.npy")
+FEET_PER_METER = 3.281
+DEFAULT_MIN_HEIGHT = 150  # feet, as filter_facilities
+DEFAULT_BLOCK_ROWS = 100000
+RELAY_TYPES = ('Earth Station', 'Microwave Relay', 'Government Facility')
+LABEL_BYTES = 64
+
+# One relay per row; alt keeps the structure height converted from feet,
+# as the graph nodes have always used it
+RELAY_DTYPE = np.dtype([
+    ('lat', '<f8'),
+    ('lon', '<f8'),
+    ('alt', '<f8'),
+    ('xyz', '<f8', (3,)),
+    ('type', 'u1'),  # index into RELAY_TYPES
+    ('callsign', 'S12'),
+    ('label', f'S{LABEL_BYTES}'),  # UTF-8, truncated
+])
+
+
+def _floats(values: List[str]) -> np.ndarray:
+    """Column of numbers; blanks and junk become NaN"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        pass  # some field is not a number; convert one by one
+    out = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        try:
+            out[i] = float(value)
+        except ValueError:
+            pass
+    return out
+
+
+def _dms(columns: Dict[str, List[str]], axis: str, negative: str) -> np.ndarray:
+    degrees = _floats(columns[f'{axis}_deg'])
+    minutes = np.nan_to_num(_floats(columns[f'{axis}_min']))
+    seconds = np.nan_to_num(_floats(columns[f'{axis}_sec']))
+    sign = np.where(np.char.upper(np.array(columns[f'{axis}_dir'], dtype=str)) == negative, -1.0, 1.0)
+    return sign * (degrees + minutes / 60 + seconds / 3600)
+
+
+def _labels(types: np.ndarray, locations: List[str]) -> np.ndarray:
+    """RelayCatalog labels, e.g. "Earth Station (New York, NY)", as UTF-8"""
+    labels = [f"{RELAY_TYPES[t]} ({location.split(' - ')[0]})".encode()[:LABEL_BYTES]
+              for t, location in zip(types.tolist(), locations)]
+    return np.array(labels, dtype=f'S{LABEL_BYTES}')
+
+
+def convert_block(header: List[str], rows: List[List[str]], min_height: float) -> np.ndarray:
+    """
+    Relay records for the rows of one block that pass the filter.
+    """
+    columns = {name: [row[i] if i < len(row) else '' for row in rows] for i, name in enumerate(header)}
+    if 'lat' in columns:
+        lat, lon = _floats(columns['lat']), _floats(columns['lon'])
+    else:
+        lat, lon = _dms(columns, 'lat', 'S'), _dms(columns, 'lon', 'W')
+    height = _floats(columns['structure_height'])
+    kind = np.array(columns['facility_type'], dtype=str)
+    type_index = np.full(len(rows), -1)
+    for i, name in enumerate(RELAY_TYPES):
+        type_index[kind == name] = i
+
+    keep = ((height >= min_height) & (type_index >= 0)
+            & (np.abs(lat) <= 90) & (np.abs(lon) <= 180))
+    rows_kept = np.nonzero(keep)[0]
+    out = np.zeros(len(rows_kept), dtype=RELAY_DTYPE)
+    out['lat'] = lat[rows_kept]
+    out['lon'] = lon[rows_kept]
+    out['alt'] = height[rows_kept] / FEET_PER_METER
+    out['xyz'] = ecef(out['lat'], out['lon'], out['alt'])
+    out['type'] = type_index[rows_kept]
+    callsigns = columns.get('callsign', [''] * len(rows))
+    out['callsign'] = [callsigns[i].encode()[:12] for i in rows_kept.tolist()]
+    locations = columns.get('location', [''] * len(rows))
+    out['label'] = _labels(out['type'], [locations[i] for i in rows_kept.tolist()])
+    return out
+
+
+def ingest(dump_path: str, output: str = RELAY_FILE, min_height: float = DEFAULT_MIN_HEIGHT,
+           block_rows: int = DEFAULT_BLOCK_ROWS) -> Dict[str, int]:
+    """
+    Stream dump_path into a relay .npy file; returns row counts. Rows with
+    fewer fields than the header are treated as blank in the missing ones.
+    """
+    total = kept = 0
+    directory = os.path.dirname(os.path.abspath(output))
+    with open(dump_path, "r", newline="", encoding="utf-8", errors="replace") as f, \
+            tempfile.TemporaryFile(dir=directory) as records:
+        reader = csv.reader(f, delimiter='|', quoting=csv.QUOTE_NONE)
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = {'structure_height', 'facility_type'} - set(header)
+        if 'lat' not in header and 'lat_deg' not in header:
+            missing.add('lat')
+        if missing:
+            raise ValueError(f"{dump_path}: missing columns {', '.join(sorted(missing))}")
+        while True:
+            rows = list(itertools.islice(reader, block_rows))
+            if not rows:
+                break
+            block = convert_block(header, rows, min_height)
+            records.write(block.tobytes())
+            total += len(rows)
+            kept += len(block)
+
+        # Prepend the .npy header now that the row count is known
+        records.seek(0)
+        with open(output + ".tmp", "wb") as out:
+            np.lib.format.write_array_header_1_0(
+                out, {'descr': np.lib.format.dtype_to_descr(RELAY_DTYPE), 'fortran_order': False,
+                      'shape': (kept,)})
+            shutil.copyfileobj(records, out)
+    os.replace(output + ".tmp", output)
+    return {'rows': total, 'relays': kept}
+
+
+def load_relays(path: str = RELAY_FILE) -> Optional[np.ndarray]:
+    """
+    The relay records, memory-mapped; None if the file is missing or was
+    written with a different layout.
+    """
+    try:
+        relays = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    return relays if relays.dtype == RELAY_DTYPE and relays.ndim == 1 else None
+
+
+def write_synthetic_dump(path: str, rows: int, seed: int = 0, block_rows: int = DEFAULT_BLOCK_ROWS):
+    """
+    A '|'-delimited dump of random US structures in the ASR degrees/minutes/
+    seconds form, with a mix of facility types, heights and blank fields.
+    """
+    rng = np.random.default_rng(seed)
+    kinds = np.array(RELAY_TYPES + ('Broadcast Tower', 'Cell Tower', ''))
+    with open(path, "w") as f:
+        f.write("callsign|lat_deg|lat_min|lat_sec|lat_dir|lon_deg|lon_min|lon_sec|lon_dir|"
+                "structure_height|facility_type|location\n")
+        for start in range(0, rows, block_rows):
+            n = min(block_rows, rows - start)
+            lat = rng.uniform(19, 65, n)
+            lon = rng.uniform(67, 160, n)
+            height = rng.integers(20, 2000, n).astype(str)
+            height[rng.random(n) < 0.01] = ''
+            kind = kinds[rng.integers(0, len(kinds), n)]
+            lines = (f"S{start + i}|{int(la)}|{int(la * 60) % 60}|{la * 3600 % 60:.1f}|N|"
+                     f"{int(lo)}|{int(lo * 60) % 60}|{lo * 3600 % 60:.1f}|W|{h}|{k}|Site {start + i} - Tower\n"
+                     for i, (la, lo, h, k) in enumerate(zip(lat.tolist(), lon.tolist(), height, kind)))
+            f.writelines(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest an FCC ASR dump into a relay file.")
+    parser.add_argument("dump")
+    parser.add_argument("--output", default=RELAY_FILE)
+    parser.add_argument("--min-height", type=float, default=DEFAULT_MIN_HEIGHT, help="feet")
+    parser.add_argument("--block-rows", type=int, default=DEFAULT_BLOCK_ROWS)
+    parser.add_argument("--synthetic", type=int, metavar="ROWS",
+                        help="write a synthetic dump with this many rows to DUMP instead")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.synthetic is not None:
+        write_synthetic_dump(args.dump, args.synthetic)
+        print(f"Wrote {args.synthetic} synthetic rows to {args.dump} in {time.perf_counter() - start:.1f}s")
+        return
+    counts = ingest(args.dump, args.output, args.min_height, args.block_rows)
+    print(f"Kept {counts['relays']} of {counts['rows']} structures, wrote {args.output} "
+          f"({os.path.getsize(args.output) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,11 @@ This replaces the random Jack in the Box locations with actual communication inf
 """
 
 import json
+import os
 from typing import List, Dict
 
+from fcc_ingest import RELAY_TYPES
+
 def fetch_fcc_antenna_data() -> List[Dict]:
     """
     Fetch FCC antenna structure data and filter for relevant communication facilities.
@@ -179,7 +182,7 @@ def filter_facilities(facilities: List[Dict], min_height: int = 150) -> List[Dic
     filtered = [
         facility for facility in facilities 
         if facility['structure_height'] >= min_height
-        and facility['facility_type'] in ['Earth Station', 'Microwave Relay', 'Government Facility']
+        and facility['facility_type'] in RELAY_TYPES
     ]
     
     print(f"Filtered to {len(filtered)} suitable relay facilities")
@@ -208,7 +211,7 @@ def save_fcc_data(facilities: List[Dict], filename: str = "fcc_facilities.json")
     """
     Save the processed FCC facility data to JSON file.
     """
-    filepath = f"/workspaces/ubuntu-2/App/{filename}"
+    filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
     
     with open(filepath, 'w') as f:
         json.dump(facilities, f, indent=2)
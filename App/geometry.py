@@ -0,0 +1,146 @@
+"""
+Shared geometry for the satellite network: ECEF conversion and 3D distances.
+
+Positions are held as a contiguous (n, 3) float64 array of ECEF coordinates
+(km) so distances can be computed in broadcast blocks instead of one Python
+call per pair. Points with a missing or non-finite coordinate get a NaN row,
+which never compares closer than any distance.
+"""
+
+import math
+from typing import Iterator, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+# Upper bound on the temporary arrays allocated for one block of distances
+DEFAULT_BLOCK_BYTES = 32 * 1024 * 1024
+
+# distance_3d squares with Python's float pow(), which can differ from x*x in
+# the last bit. Pairs are screened with the fast kernel using this relative
+# slack and then recomputed with pair_distances to match distance_3d exactly.
+SCREEN_SLACK = 1e-9
+
+
+def to_xyz(lat: float, lon: float, alt_km: float) -> Tuple[float, float, float]:
+    R = EARTH_RADIUS_KM + alt_km  # Earth radius + altitude
+    lat_rad = math.radians(lat)
+    lon_rad = math.radians(lon)
+    x = R * math.cos(lat_rad) * math.cos(lon_rad)
+    y = R * math.cos(lat_rad) * math.sin(lon_rad)
+    z = R * math.sin(lat_rad)
+    return x, y, z
+
+
+def distance_3d(point1, point2) -> float:
+    """
+    Straight-line distance in km between two [lat, lon, alt, ...] points.
+    """
+    x1, y1, z1 = to_xyz(point1[0], point1[1], point1[2])
+    x2, y2, z2 = to_xyz(point2[0], point2[1], point2[2])
+    return math.sqrt((x1 - x2)**2 + (y1 - y2)**2 + (z1 - z2)**2)
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def lat_lon_alt(points) -> np.ndarray:
+    """
+    (n, 3) float64 array of [lat, lon, alt] from point lists; unparseable
+    values become NaN.
+    """
+    coords = np.array([(_as_float(p[0]), _as_float(p[1]), _as_float(p[2])) for p in points],
+                      dtype=np.float64).reshape(-1, 3)
+    coords[~np.isfinite(coords).all(axis=1)] = np.nan
+    return coords
+
+
+def ecef(lat, lon, alt_km) -> np.ndarray:
+    """
+    Vectorized to_xyz: contiguous (n, 3) float64 array of ECEF positions.
+    """
+    R = EARTH_RADIUS_KM + np.asarray(alt_km, dtype=np.float64)
+    lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+    lon_rad = np.radians(np.asarray(lon, dtype=np.float64))
+    xyz = np.empty((R.shape[0], 3), dtype=np.float64)
+    xyz[:, 0] = R * np.cos(lat_rad) * np.cos(lon_rad)
+    xyz[:, 1] = R * np.cos(lat_rad) * np.sin(lon_rad)
+    xyz[:, 2] = R * np.sin(lat_rad)
+    return xyz
+
+
+def positions_xyz(points) -> np.ndarray:
+    """
+    ECEF positions of [lat, lon, alt, ...] point lists, converted once.
+    """
+    coords = lat_lon_alt(points)
+    return ecef(coords[:, 0], coords[:, 1], coords[:, 2])
+
+
+def block_distances(xyz_a: np.ndarray, xyz_b: np.ndarray) -> np.ndarray:
+    """
+    Distance matrix between every row of xyz_a and every row of xyz_b.
+
+    Values may differ from distance_3d in the last bit; use pair_distances
+    where exact agreement matters.
+    """
+    d2 = (xyz_a[:, None, 0] - xyz_b[None, :, 0])**2
+    d2 += (xyz_a[:, None, 1] - xyz_b[None, :, 1])**2
+    d2 += (xyz_a[:, None, 2] - xyz_b[None, :, 2])**2
+    return np.sqrt(d2, out=d2)
+
+
+def pair_distances(xyz: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Distances between xyz[a] and xyz[b] element-wise, bit-identical to
+    distance_3d on the same points.
+    """
+    d2 = np.float_power(xyz[a, 0] - xyz[b, 0], 2)
+    d2 += np.float_power(xyz[a, 1] - xyz[b, 1], 2)
+    d2 += np.float_power(xyz[a, 2] - xyz[b, 2], 2)
+    return np.sqrt(d2, out=d2)
+
+
+def block_rows(n_cols: int, max_bytes: int = DEFAULT_BLOCK_BYTES) -> int:
+    """
+    Number of rows of an (rows, n_cols) distance block that fit in max_bytes,
+    counting the result plus the temporaries of one axis.
+    """
+    return max(1, max_bytes // (3 * 8 * max(n_cols, 1)))
+
+
+def distance_blocks(xyz: np.ndarray,
+                    max_bytes: int = DEFAULT_BLOCK_BYTES) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yield (row_start, block) where block holds the distances from
+    xyz[row_start:row_start + len(block)] to every position.
+    """
+    rows = block_rows(len(xyz), max_bytes)
+    for start in range(0, len(xyz), rows):
+        yield start, block_distances(xyz[start:start + rows], xyz)
+
+
+def pairs_within(xyz: np.ndarray, max_distance: float,
+                 max_bytes: int = DEFAULT_BLOCK_BYTES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All ordered pairs (i, j), i != j, closer than max_distance, as parallel
+    (i, j, distance) arrays sorted by i then j.
+    """
+    src, dst, dist = [], [], []
+    screen = max_distance * (1 + SCREEN_SLACK)
+    for start, block in distance_blocks(xyz, max_bytes):
+        rows, cols = np.nonzero(block < screen)
+        rows += start
+        d = pair_distances(xyz, rows, cols)
+        keep = (d < max_distance) & (rows != cols)
+        src.append(rows[keep])
+        dst.append(cols[keep])
+        dist.append(d[keep])
+    if not src:
+        return (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64))
+    return np.concatenate(src), np.concatenate(dst), np.concatenate(dist)
@@ -0,0 +1,211 @@
+"""
+Land/ocean classification from the bundled Natural Earth land polygons.
+
+The old is_on_land built a shapely Point and tested it against every land
+polygon through geopandas, which was too slow per marker and pulled in the
+whole geospatial stack. Here the shapefile is read directly with struct and
+the polygons are rasterized once into a packed lat/lon bitmask, so a batch
+of positions is classified with a few array lookups. Accuracy is one cell
+(DEFAULT_RESOLUTION degrees) along the coastlines, finer than the 1:110m
+source data itself.
+
+`python landmask.py` precompiles the bitmask to a .npy file next to the
+shapefile; the app memory-maps it on first use instead of rasterizing at
+startup, and only falls back to the shapefile when it is missing or stale.
+
+Usage: python landmask.py [--resolution 0.1] [--output PATH]
+"""
+
+import argparse
+import os
+import struct
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+LAND_SHAPEFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "natural_earth_land", "ne_110m_land.shp")
+LAND_MASK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "natural_earth_land", "ne_110m_land_mask.npy")
+DEFAULT_RESOLUTION = 0.1  # degrees per cell
+
+_SHAPEFILE_CODE = 9994
+_POLYGON_TYPES = (5, 15, 25)  # Polygon, PolygonZ, PolygonM: XY points come first
+
+
+def read_polygon_rings(path: str) -> List[np.ndarray]:
+    """
+    Every ring of every polygon record in a shapefile, as (k, 2) lon/lat
+    arrays. Raises ValueError if the file is not a polygon shapefile.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < 100 or struct.unpack_from(">i", data, 0)[0] != _SHAPEFILE_CODE:
+        raise ValueError(f"{path} is not a shapefile")
+    if struct.unpack_from("<i", data, 32)[0] not in _POLYGON_TYPES:
+        raise ValueError(f"{path} does not contain polygons")
+
+    rings = []
+    offset = 100
+    while offset + 8 <= len(data):
+        _, length = struct.unpack_from(">ii", data, offset)
+        content = offset + 8
+        offset = content + 2 * length  # lengths are in 16-bit words
+        if struct.unpack_from("<i", data, content)[0] not in _POLYGON_TYPES:
+            continue  # null shape
+        num_parts, num_points = struct.unpack_from("<ii", data, content + 36)
+        parts = np.frombuffer(data, "<i4", num_parts, content + 44).tolist() + [num_points]
+        xy = np.frombuffer(data, "<f8", 2 * num_points, content + 44 + 4 * num_parts).reshape(-1, 2)
+        rings.extend(xy[start:stop] for start, stop in zip(parts[:-1], parts[1:]) if stop - start >= 3)
+    return rings
+
+
+def rasterize(rings: List[np.ndarray], resolution: float = DEFAULT_RESOLUTION) -> np.ndarray:
+    """
+    Boolean (rows, cols) grid, row 0 at the north pole, marking cells whose
+    centre lies inside the rings by the even-odd rule (so holes stay empty).
+
+    Scanline fill: every edge yields its crossing with each row centre it
+    spans, crossings are sorted per row and paired into spans, and the
+    spans are filled through a per-row difference array.
+    """
+    rows = int(round(180 / resolution))
+    cols = int(round(360 / resolution))
+    if not rings:
+        return np.zeros((rows, cols), dtype=bool)
+    start = np.concatenate([ring for ring in rings])
+    stop = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+    x0, y0, x1, y1 = start[:, 0], start[:, 1], stop[:, 0], stop[:, 1]
+    sloped = y0 != y1
+    x0, y0, x1, y1 = x0[sloped], y0[sloped], x1[sloped], y1[sloped]
+
+    # Rows whose centre latitude lies in [min(y0, y1), max(y0, y1))
+    first = np.floor((90 - np.maximum(y0, y1)) / resolution - 0.5).astype(np.int64) + 1
+    last = np.floor((90 - np.minimum(y0, y1)) / resolution - 0.5).astype(np.int64)
+    first = np.clip(first, 0, rows)
+    last = np.clip(last, -1, rows - 1)
+    counts = np.maximum(last - first + 1, 0)
+    edge = np.repeat(np.arange(len(counts)), counts)
+    row = first[edge] + np.arange(len(edge)) - np.repeat(np.cumsum(counts) - counts, counts)
+    centre = 90 - (row + 0.5) * resolution
+    x = x0[edge] + (centre - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+
+    order = np.lexsort((x, row))
+    row, x = row[order], x[order]
+    span_row = row[0::2]
+    # Cells whose centre longitude lies in [x_start, x_end)
+    col_start = np.clip(np.ceil((x[0::2] + 180) / resolution - 0.5), 0, cols).astype(np.int64)
+    col_end = np.clip(np.ceil((x[1::2] + 180) / resolution - 0.5), 0, cols).astype(np.int64)
+    diff = np.zeros((rows, cols + 1), dtype=np.int16)
+    np.add.at(diff, (span_row, col_start), 1)
+    np.add.at(diff, (span_row, col_end), -1)
+    return np.cumsum(diff, axis=1, dtype=np.int16)[:, :cols] > 0
+
+
+class LandMask:
+    """
+    Packed land bitmask over a regular lat/lon grid.
+    """
+
+    def __init__(self, bits: np.ndarray, resolution: float):
+        self.bits = bits
+        self.resolution = resolution
+        self.rows = bits.shape[0]
+        self.cols = int(round(360 / resolution))
+
+    @classmethod
+    def from_shapefile(cls, path: str = LAND_SHAPEFILE,
+                       resolution: float = DEFAULT_RESOLUTION) -> "LandMask":
+        grid = rasterize(read_polygon_rings(path), resolution)
+        return cls(np.packbits(grid, axis=1), resolution)
+
+    @classmethod
+    def load(cls, path: str = LAND_MASK_PATH) -> Optional["LandMask"]:
+        """
+        Memory-map a mask written by save(); None if it is missing or not a
+        packed mask. The resolution follows from the number of rows.
+        """
+        try:
+            bits = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if bits.ndim != 2 or bits.dtype != np.uint8 or bits.shape[0] == 0:
+            return None
+        mask = cls(bits, 180 / bits.shape[0])
+        if bits.shape[1] != (mask.cols + 7) // 8:
+            return None
+        return mask
+
+    def save(self, path: str = LAND_MASK_PATH):
+        # Write to a temp file and rename so readers never see a partial mask
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self.bits))
+        os.replace(path + ".tmp", path)
+
+    def approx_bytes(self) -> int:
+        return self.bits.nbytes
+
+    def contains(self, lat, lon) -> np.ndarray:
+        """
+        True where (lat, lon) is on land; arrays broadcast, scalars give a
+        0-d array. Non-finite positions are never on land.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        finite = np.isfinite(lat) & np.isfinite(lon)
+        lat = np.where(finite, lat, 0.0)
+        lon = np.where(finite, lon, 0.0)
+        row = np.clip(np.floor((90 - lat) / self.resolution), 0, self.rows - 1).astype(np.int64)
+        col = np.floor(((lon + 180) % 360) / self.resolution).astype(np.int64) % self.cols
+        on_land = (self.bits[row, col >> 3] >> (7 - (col & 7))) & 1
+        return on_land.astype(bool) & finite
+
+
+_land_mask: Optional[LandMask] = None
+_land_mask_lock = threading.Lock()
+
+
+def _is_stale(path: str, source: str) -> bool:
+    try:
+        return os.path.getmtime(path) < os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def get_land_mask() -> LandMask:
+    """
+    The shared mask, loaded on first use: memory-mapped from the
+    precompiled file, or rasterized from the shapefile if that is missing
+    or older than the shapefile.
+    """
+    global _land_mask
+    with _land_mask_lock:
+        if _land_mask is None:
+            mask = None if _is_stale(LAND_MASK_PATH, LAND_SHAPEFILE) else LandMask.load(LAND_MASK_PATH)
+            if mask is None:
+                print(f"No current {os.path.basename(LAND_MASK_PATH)}; rasterizing the land shapefile "
+                      f"(run landmask.py to precompile it)")
+                mask = LandMask.from_shapefile()
+            _land_mask = mask
+        return _land_mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompile the Natural Earth land mask.")
+    parser.add_argument("--resolution", type=float, default=DEFAULT_RESOLUTION,
+                        help="degrees per cell; must divide 180")
+    parser.add_argument("--shapefile", default=LAND_SHAPEFILE)
+    parser.add_argument("--output", default=LAND_MASK_PATH)
+    args = parser.parse_args()
+
+    if abs(180 / args.resolution - round(180 / args.resolution)) > 1e-9:
+        parser.error("resolution must divide 180 degrees")
+    mask = LandMask.from_shapefile(args.shapefile, args.resolution)
+    mask.save(args.output)
+    print(f"Wrote {args.output}: {mask.rows}x{mask.cols} cells at {args.resolution:g} deg, "
+          f"{mask.approx_bytes() / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test against a running app.
+
+Fires page requests with a mix of hours, ranges and relay settings from many
+threads and reports throughput, latency percentiles and status codes, plus
+the executor's job counters. Pending (202) answers are counted separately:
+they show the request thread was released while the routing job ran.
+
+Usage: python loadtest.py [--url http://localhost:5001] [--concurrency 16]
+                          [--requests 200] [--distinct 12] [--wait 20]
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def query_mix(distinct, seed=0):
+    """
+    distinct (hour, range, relay) settings; repeats exercise deduplication
+    and the result caches.
+    """
+    rng = random.Random(seed)
+    return [(rng.randrange(24), rng.choice(range(100, 1001, 50)), rng.random() < 0.5)
+            for _ in range(distinct)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=12,
+                        help="number of different slider settings in the mix")
+    parser.add_argument("--wait", type=float, default=20,
+                        help="seconds the server may wait for a routing job")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mix = query_mix(args.distinct, args.seed)
+    rng = random.Random(args.seed + 1)
+    plan = [rng.choice(mix) for _ in range(args.requests)]
+
+    local = threading.local()
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def fire(query):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        hour, max_range, jack = query
+        params = {'value': max_range, 'hour': hour, 'jack': int(jack), 'wait': args.wait}
+        start = time.perf_counter()
+        try:
+            status = session.get(args.url + "/", params=params, timeout=args.wait + 30).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(fire, plan))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {len(mix)} distinct settings")
+    print(f"wall {wall:.2f}s  throughput {args.requests / wall:.1f} req/s")
+    print(f"latency p50 {percentile(latencies, 0.50) * 1000:.0f} ms  "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms  "
+          f"max {latencies[-1] * 1000:.0f} ms")
+    print("status " + "  ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+    for endpoint in ("/api/jobs", "/api/cache"):
+        try:
+            print(f"{endpoint} {requests.get(args.url + endpoint, timeout=5).json()}")
+        except (requests.RequestException, ValueError) as e:
+            print(f"{endpoint} unavailable: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Dashboard metrics precomputed for every hour and range bucket.
+
+The sidebar metrics only depend on the snapshot, the range and the relay
+flag, so instead of routing on every slider move they are computed once per
+snapshot version for a grid of ranges and kept as one float32 array of shape
+(hours, ranges, fields). The cube is written to a compressed .npz file so a
+restart serves it immediately, and rows are rebuilt only for snapshot
+versions not already in the previous cube, so a row follows its snapshot
+when the hour window shifts.
+"""
+
+import hashlib
+import os
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+CUBE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics_cache")
+RANGE_STEP = 10  # km between buckets
+MAX_RANGE = 1000  # slider maximum, km
+
+# Same keys and order as pipeline.compute_metrics
+METRIC_FIELDS = (
+    'total_satellites', 'total_fcc_relays', 'reachable_satellites', 'coverage_percent',
+    'avg_hops', 'max_hops', 'min_hops', 'max_distance', 'min_distance', 'avg_distance',
+)
+INTEGER_FIELDS = frozenset(('total_satellites', 'total_fcc_relays', 'reachable_satellites',
+                            'max_hops', 'min_hops'))
+
+
+def cube_path(jack_enabled: bool, cube_dir: str = CUBE_DIR) -> str:
+    return os.path.join(cube_dir, f"metrics-{int(jack_enabled)}.npz")
+
+
+def range_buckets(step: float = RANGE_STEP, max_range: float = MAX_RANGE) -> np.ndarray:
+    return np.arange(0, max_range + step / 2, step, dtype=np.float64)
+
+
+def cube_key(versions: Dict[int, str], jack_enabled: bool, relay_version: str = "") -> str:
+    """
+    Content key for the cube built from these snapshot versions and, with
+    relays enabled, this relay catalog version.
+    """
+    text = ",".join(f"{hour}:{versions[hour]}" for hour in sorted(versions))
+    text = f"{text}|{int(jack_enabled)}|{relay_version}"
+    return "metrics-" + hashlib.sha1(text.encode()).hexdigest()[:20]
+
+
+class MetricsCube:
+    """
+    values[i, j, f] is metric METRIC_FIELDS[f] for hours[i] at range
+    ranges[j]; versions[i] is the snapshot version that row was built from,
+    and relay_version the relay catalog's, empty without relays.
+    """
+
+    def __init__(self, hours: Sequence[int], versions: Sequence[str], ranges: np.ndarray,
+                 values: np.ndarray, jack_enabled: bool, relay_version: str = ""):
+        self.hours = [int(hour) for hour in hours]
+        self.versions = [str(version) for version in versions]
+        self.ranges = np.asarray(ranges, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.jack_enabled = bool(jack_enabled)
+        self.relay_version = str(relay_version)
+        self.key = cube_key(dict(zip(self.hours, self.versions)), self.jack_enabled, self.relay_version)
+
+    def approx_bytes(self) -> int:
+        return self.values.nbytes + self.ranges.nbytes
+
+    def matches(self, versions: Dict[int, str], relay_version: str = "") -> bool:
+        return dict(zip(self.hours, self.versions)) == versions and self.relay_version == relay_version
+
+    def row(self, version: str) -> Optional[np.ndarray]:
+        """
+        Metrics for every range bucket of the snapshot with this version,
+        whichever hour it was at when the cube was built.
+        """
+        if version not in self.versions:
+            return None
+        return self.values[self.versions.index(version)]
+
+    def bucket(self, max_range: float) -> int:
+        """
+        Index of the range bucket nearest to max_range.
+        """
+        j = int(np.searchsorted(self.ranges, max_range))
+        if j == len(self.ranges) or (j > 0 and max_range - self.ranges[j - 1] <= self.ranges[j] - max_range):
+            j -= 1
+        return j
+
+    def metrics(self, hour: int, max_range: float) -> Optional[dict]:
+        """
+        compute_metrics() dict for the nearest range bucket, or None if the
+        hour is not in the cube.
+        """
+        if hour not in self.hours:
+            return None
+        values = self.values[self.hours.index(hour), self.bucket(max_range)].tolist()
+        return {field: int(value) if field in INTEGER_FIELDS else round(value, 1)
+                for field, value in zip(METRIC_FIELDS, values)}
+
+    def as_dict(self) -> dict:
+        """
+        JSON form: metrics[field][i][j] for hours[i] and range_km[j].
+        """
+        return {
+            'key': self.key,
+            'jack': self.jack_enabled,
+            'hours': self.hours,
+            'range_km': self.ranges.tolist(),
+            'metrics': {
+                field: (self.values[:, :, f].astype(np.int64).tolist() if field in INTEGER_FIELDS
+                        else np.round(self.values[:, :, f].astype(np.float64), 1).tolist())
+                for f, field in enumerate(METRIC_FIELDS)
+            },
+        }
+
+    def save(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so readers never see a partial cube
+            with open(path + ".tmp", "wb") as f:
+                np.savez_compressed(f, hours=np.array(self.hours, dtype=np.int16),
+                                    versions=np.array(self.versions), ranges=self.ranges,
+                                    values=self.values, jack=np.array(self.jack_enabled),
+                                    relay_version=np.array(self.relay_version))
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Could not persist metrics cube {path}: {e}")
+
+    @classmethod
+    def load(cls, path: str) -> Optional["MetricsCube"]:
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                cube = cls(data['hours'].tolist(), data['versions'].tolist(), data['ranges'],
+                           data['values'], bool(data['jack']), str(data['relay_version']))
+        except (OSError, ValueError, KeyError):
+            return None
+        if cube.values.shape != (len(cube.hours), len(cube.ranges), len(METRIC_FIELDS)):
+            return None  # written with a different field list
+        return cube
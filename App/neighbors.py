@@ -0,0 +1,208 @@
+"""
+Neighbor search for the satellite network graph.
+
+Every point is converted to ECEF xyz once and bucketed into a uniform 3D grid
+whose cell edge is at least the search radius. Any pair closer than the radius
+must then sit in the same or an adjacent cell, so each point is only compared
+against the 27 surrounding cells instead of every other node.
+"""
+
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from geometry import DEFAULT_BLOCK_BYTES, SCREEN_SLACK, pair_distances, pairs_within, positions_xyz
+
+Neighbors = List[List[Tuple[int, float]]]
+
+# Keeps the packed (x, y, z) cell key within int64 for any search radius
+_MAX_CELLS_PER_AXIS = 1 << 20
+
+# Below this many points one dense distance block is cheaper than the grid's
+# fixed per-offset overhead (see bench_neighbors.py)
+GRID_MIN_POINTS = 500
+
+_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+
+EMPTY_PAIRS = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64))
+
+
+class GridIndex(NamedTuple):
+    """
+    Uniform grid over the finite rows of an xyz array: idx are those rows,
+    keys their packed cell keys, and sorted_keys/sorted_idx the same sorted
+    by cell. lo and cell_size place other points in the same cells.
+    """
+    idx: np.ndarray
+    keys: np.ndarray
+    sorted_keys: np.ndarray
+    sorted_idx: np.ndarray
+    base: int
+    lo: Optional[np.ndarray] = None
+    cell_size: float = 0.0
+
+
+def grid_index(xyz: np.ndarray, max_distance: float, min_points: int = 2) -> Optional[GridIndex]:
+    """
+    Bucket the finite rows of xyz into cells at least max_distance wide;
+    None if there are fewer than min_points such rows.
+    """
+    idx = np.nonzero(np.isfinite(xyz).all(axis=1))[0]
+    if max_distance <= 0 or len(idx) < max(min_points, 1):
+        return None
+
+    pos = xyz[idx]
+    lo = pos.min(axis=0)
+    span = float((pos.max(axis=0) - lo).max())
+    cell_size = max(float(max_distance), span / (_MAX_CELLS_PER_AXIS - 4), 1e-9)
+
+    # Shift cells to start at 1 so every neighbor offset stays in [0, base)
+    cells = np.floor((pos - lo) / cell_size).astype(np.int64) + 1
+    base = int(cells.max()) + 2
+    keys = (cells[:, 0] * base + cells[:, 1]) * base + cells[:, 2]
+    order = np.argsort(keys, kind='stable')
+    return GridIndex(idx, keys, keys[order], idx[order], base, lo, cell_size)
+
+
+def _candidates(keys: np.ndarray, grid: GridIndex, max_bytes: int):
+    """
+    (a, b) pairs of positions in keys and grid rows in the 27 cells around
+    each key, in slices of at most max_bytes // 64 pairs.
+    """
+    sorted_keys, sorted_idx, base = grid.sorted_keys, grid.sorted_idx, grid.base
+    max_pairs = max(1, max_bytes // 64)
+    for dx, dy, dz in _OFFSETS:
+        target = keys + (dx * base + dy) * base + dz
+        first = np.searchsorted(sorted_keys, target, side='left')
+        counts = np.searchsorted(sorted_keys, target, side='right') - first
+        totals = np.cumsum(counts)
+        lo = 0
+        while lo < len(keys):
+            limit = (totals[lo - 1] if lo else 0) + max_pairs
+            hi = max(lo + 1, int(np.searchsorted(totals, limit, side='right')))
+            c = counts[lo:hi]
+            n_pairs = int(c.sum())
+            if n_pairs:
+                a = np.repeat(np.arange(lo, hi), c)
+                within = np.arange(n_pairs) - np.repeat(np.cumsum(c) - c, c)
+                yield a, sorted_idx[first[a] + within]
+            lo = hi
+
+
+def _screen(xyz_a: np.ndarray, a: np.ndarray, xyz_b: np.ndarray, b: np.ndarray,
+            max_distance: float) -> np.ndarray:
+    """Cheap distance test that keeps every pair closer than max_distance"""
+    d = np.sqrt((xyz_a[a, 0] - xyz_b[b, 0])**2 + (xyz_a[a, 1] - xyz_b[b, 1])**2
+                + (xyz_a[a, 2] - xyz_b[b, 2])**2)
+    return d < max_distance * (1 + SCREEN_SLACK)
+
+
+def _sorted_pairs(src, dst, dist) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if not src:
+        return EMPTY_PAIRS
+    src, dst, dist = np.concatenate(src), np.concatenate(dst), np.concatenate(dist)
+    order = np.lexsort((dst, src))
+    return src[order], dst[order], dist[order]
+
+
+def grid_query(xyz: np.ndarray, grid: GridIndex, max_distance: float, start: int = 0,
+               stop: Optional[int] = None,
+               max_bytes: int = DEFAULT_BLOCK_BYTES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairs whose first node is one of grid.idx[start:stop], as (i, j, distance)
+    arrays sorted by i then j. Disjoint row ranges give disjoint, ordered
+    slices of the full result, so shards can be computed independently.
+    """
+    stop = len(grid.idx) if stop is None else stop
+    src, dst, dist = [], [], []
+    # Candidate pairs are expanded in slices so memory stays under max_bytes
+    for a, b in _candidates(grid.keys[start:stop], grid, max_bytes):
+        a = grid.idx[start + a]
+        keep = _screen(xyz, a, xyz, b, max_distance) & (a != b)
+        a, b = a[keep], b[keep]
+        d = pair_distances(xyz, a, b)
+        keep = d < max_distance
+        src.append(a[keep])
+        dst.append(b[keep])
+        dist.append(d[keep])
+    return _sorted_pairs(src, dst, dist)
+
+
+def grid_query_points(points: np.ndarray, xyz: np.ndarray, grid: GridIndex, max_distance: float,
+                      max_bytes: int = DEFAULT_BLOCK_BYTES):
+    """
+    Pairs between a second set of positions and the grid built over xyz:
+    yields (i, j, distance) arrays for the finite rows i of points and rows
+    j of xyz closer than max_distance, a slice of at most max_bytes of
+    candidates at a time and in no particular order.
+    """
+    rows = np.nonzero(np.isfinite(points).all(axis=1))[0]
+    if len(rows) == 0:
+        return
+    # Points off the grid are clamped to its edge cells, whose neighbors
+    # include every grid cell they could reach, so no key wraps to another axis
+    cells = np.floor((points[rows] - grid.lo) / grid.cell_size) + 1
+    cells = np.clip(cells, 1, grid.base - 2).astype(np.int64)
+    keys = (cells[:, 0] * grid.base + cells[:, 1]) * grid.base + cells[:, 2]
+    for a, b in _candidates(keys, grid, max_bytes):
+        a = rows[a]
+        keep = _screen(points, a, xyz, b, max_distance)
+        a, b = a[keep], b[keep]
+        d = np.float_power(points[a, 0] - xyz[b, 0], 2)
+        d += np.float_power(points[a, 1] - xyz[b, 1], 2)
+        d += np.float_power(points[a, 2] - xyz[b, 2], 2)
+        np.sqrt(d, out=d)
+        keep = d < max_distance
+        yield a[keep], b[keep], d[keep]
+
+
+def grid_pairs(xyz: np.ndarray, max_distance: float,
+               max_bytes: int = DEFAULT_BLOCK_BYTES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All ordered pairs (i, j), i != j, closer than max_distance, as parallel
+    (i, j, distance) arrays sorted by i then j. Rows of xyz containing NaN
+    never pair with anything.
+    """
+    grid = grid_index(xyz, max_distance)
+    if grid is None:
+        return EMPTY_PAIRS
+    return grid_query(xyz, grid, max_distance, max_bytes=max_bytes)
+
+
+def to_neighbor_lists(n: int, src: np.ndarray, dst: np.ndarray, dist: np.ndarray) -> Neighbors:
+    """
+    Convert (i, j, distance) arrays sorted by i then j to the adjacency list
+    format used by the router: res[i] = [(j, distance), ...].
+    """
+    pairs = list(zip(dst.tolist(), dist.tolist()))
+    bounds = np.searchsorted(src, np.arange(n + 1)).tolist()
+    return [pairs[bounds[i]:bounds[i + 1]] for i in range(n)]
+
+
+def neighbor_lists(points, max_distance: float) -> Neighbors:
+    """
+    Adjacency list of every pair of points closer than max_distance (km).
+
+    points are [lat, lon, alt, id] lists with id == index. The result is
+    identical to the brute-force scan: res[id] holds (neighbor_id, distance)
+    tuples in increasing neighbor_id order.
+    """
+    return xyz_neighbor_lists(positions_xyz(points), max_distance)
+
+
+def xyz_neighbor_lists(xyz: np.ndarray, max_distance: float) -> Neighbors:
+    """
+    neighbor_lists for positions already converted to ECEF, such as
+    PointSet.xyz.
+    """
+    if len(xyz) < GRID_MIN_POINTS:
+        return to_neighbor_lists(len(xyz), *pairs_within(xyz, max_distance))
+    return to_neighbor_lists(len(xyz), *grid_pairs(xyz, max_distance))
+
+
+def grid_neighbor_lists(points, max_distance: float) -> Neighbors:
+    return to_neighbor_lists(len(points), *grid_pairs(positions_xyz(points), max_distance))
+
+
+def dense_neighbor_lists(points, max_distance: float) -> Neighbors:
+    return to_neighbor_lists(len(points), *pairs_within(positions_xyz(points), max_distance))
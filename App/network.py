@@ -0,0 +1,121 @@
+"""
+Per-snapshot candidate edges for fast range changes.
+
+A RangeGraph finds every pair of nodes closer than MAX_RANGE_KM (the range
+slider maximum) once and keeps them sorted by length. The graph for any
+smaller range is then a prefix of that list, so moving the slider never
+recomputes distances, and widening the range updates the previous shortest
+paths instead of re-running Dijkstra from scratch.
+"""
+
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+from connectivity import CoverageCurve, coverage_curve
+from pointset import BALLOON, PointSet
+from routing import ShortestPaths, dijkstra, dijkstra_add_edges, multi_source_dijkstra
+from sharded_neighbors import sharded_pairs
+
+MAX_RANGE_KM = 1000
+
+
+class Adjacency:
+    """
+    Read-only adjacency list view over CSR arrays: graph[u] yields
+    (neighbor, distance) pairs in increasing neighbor order.
+    """
+
+    def __init__(self, indptr, indices, weights):
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def __getitem__(self, node: int):
+        start, stop = self.indptr[node], self.indptr[node + 1]
+        return zip(self.indices[start:stop], self.weights[start:stop])
+
+
+class RangeGraph:
+    """
+    All candidate edges of one point set up to max_range, sorted by length.
+    """
+
+    def __init__(self, points: PointSet, max_range: float = MAX_RANGE_KM):
+        self.points = points
+        self.n = len(points)
+        self.max_range = max_range
+        # Large snapshots shard the pair search across all cores; edges come
+        # back ordered by (src, dst), which is the CSR layout
+        src, dst, dist = sharded_pairs(points.xyz, max_range)
+        self.csr_src = src
+        self.csr_dst = dst
+        self.csr_length = dist
+        order = np.argsort(dist, kind='stable')
+        self.src = src[order]
+        self.dst = dst[order]
+        self.length = dist[order]
+        self._last: Dict[tuple, tuple] = {}  # sources -> (edge count, ShortestPaths)
+        self._coverage: Optional[CoverageCurve] = None
+        self._lock = threading.Lock()
+
+    def approx_bytes(self) -> int:
+        return 2 * (self.src.nbytes + self.dst.nbytes + self.length.nbytes) + self.points.approx_bytes()
+
+    def edge_count(self, max_distance: float) -> int:
+        """
+        Number of ordered edges strictly shorter than max_distance.
+        """
+        return int(np.searchsorted(self.length, max_distance, side='left'))
+
+    def neighbors(self, max_distance: float) -> Adjacency:
+        """
+        Adjacency for max_distance, in the same order neighbor_lists uses.
+        """
+        if max_distance > self.max_range:
+            raise ValueError(f"max_distance {max_distance} exceeds graph range {self.max_range}")
+        keep = self.csr_length < max_distance
+        indptr = np.zeros(self.n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.csr_src[keep], minlength=self.n), out=indptr[1:])
+        return Adjacency(indptr.tolist(), self.csr_dst[keep].tolist(), self.csr_length[keep].tolist())
+
+    def shortest_paths(self, max_distance: float, start: int = 0, sources=None) -> ShortestPaths:
+        """
+        Dijkstra from start, or from the nearest of sources, over edges
+        shorter than max_distance. When the previous query for the same
+        sources used a smaller range the earlier result is extended with just
+        the newly admitted edges.
+        """
+        sources = tuple(sources) if sources is not None else (start,)
+        k = self.edge_count(max_distance)
+        graph = self.neighbors(max_distance)
+        with self._lock:
+            last = self._last.get(sources)
+        if last is not None and last[0] <= k:
+            new_edges = zip(self.src[last[0]:k].tolist(), self.dst[last[0]:k].tolist(),
+                            self.length[last[0]:k].tolist())
+            paths = dijkstra_add_edges(graph, last[1], new_edges)
+        elif len(sources) == 1:
+            paths = dijkstra(graph, sources[0])
+        else:
+            paths = multi_source_dijkstra(graph, sources)
+        with self._lock:
+            self._last[sources] = (k, paths)
+        return paths
+
+    def coverage_curve(self) -> CoverageCurve:
+        """
+        Balloons connected to HQ for every range up to max_range, from one
+        union-find sweep over the length-sorted edges; computed once.
+        """
+        with self._lock:
+            curve = self._coverage
+        if curve is None:
+            curve = coverage_curve(self.n, self.src, self.dst, self.length, self.points.kind == BALLOON)
+            with self._lock:
+                self._coverage = curve
+        return curve
@@ -0,0 +1,471 @@
+"""
+Routing pipeline for one snapshot: point set, graph build, Dijkstra, metrics
+and map markers.
+
+Kept free of Flask and of the app's background threads so it can run in a
+compute worker process as well as in the request thread.
+"""
+
+import folium
+import numpy as np
+
+from landmask import get_land_mask
+from metrics_cube import METRIC_FIELDS, MetricsCube, range_buckets
+from network import MAX_RANGE_KM, RangeGraph
+from pointset import BALLOON, PALO_ALTO_OFFICE, RELAY, PointSet
+from relays import get_relay_catalog
+from results import ResultCache, RoutingResult
+from routing import dijkstra, multi_source_dijkstra
+from sharded_neighbors import sharded_neighbor_lists
+from telemetry import StageTrace
+from timegraph import TimeExpandedGraph
+
+# Per-snapshot candidate edges, so range changes skip the distance pass; room
+# for all 24 hours with and without relays, for time-expanded routing
+graph_cache = ResultCache(max_entries=48)
+
+# Per-snapshot columnar nodes, shared by graph build, routing, metrics and rendering
+point_cache = ResultCache(max_entries=48)
+
+# Markers are requested in boxes of this many degrees, aligned to multiples of it
+MARKER_BOX_DEGREES = 10
+
+
+def build_point_set(coords, jack_enabled, max_range=MAX_RANGE_KM):
+    """
+    Columnar nodes for one snapshot: HQ as node 0, balloons, then the FCC
+    relays within max_range of HQ or of some balloon. Farther relays could
+    only extend a route through a chain of relays; leaving them out keeps
+    the graph small however large the catalog grows.
+    """
+    if not jack_enabled:
+        return PointSet.build(coords)
+    catalog = get_relay_catalog()
+    ground = PointSet.build(coords)
+    rows = catalog.near(ground.xyz, max_range)
+    return PointSet.build(coords, catalog.coords(rows), relay_rows=rows)
+
+
+def get_point_set(snapshot, jack_enabled):
+    """Point set shared by every range queried for a snapshot"""
+    key = (snapshot.version, jack_enabled)
+    points = point_cache.get(key)
+    if points is None:
+        points = build_point_set(snapshot.coords, jack_enabled)
+        point_cache.put(key, points)
+    return points
+
+
+def get_range_graph(snapshot, points, jack_enabled):
+    """Candidate edges up to the slider maximum, built once per snapshot"""
+    key = (snapshot.version, jack_enabled)
+    graph = graph_cache.get(key)
+    if graph is None:
+        graph = RangeGraph(points)
+        graph_cache.put(key, graph)
+    return graph
+
+
+# Rendered once per process; markers are fetched per result from
+# /api/results/<key>/markers, so the page no longer grows with the snapshot
+_map_shell = None
+
+
+def map_shell():
+    """
+    Static folium map HTML: tiles, centre on HQ and the marker/path loading
+    script. The page defines the result key as window.resultKey.
+    """
+    global _map_shell
+    if _map_shell is not None:
+        return _map_shell
+    m = folium.Map(location=[PALO_ALTO_OFFICE[0], PALO_ALTO_OFFICE[1]], tiles="https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png",
+        attr='&copy; <a href="https://carto.com/">CartoDB</a>', zoom_start=4, min_zoom=3, max_zoom=10)
+
+    m.get_root().html.add_child(folium.Element(f"""
+    <script>
+        var resultKey = window.parent.resultKey;
+        var pathData = {{}};
+        var activePaths = {{}};
+        var markerLayers = {{}};
+        var markerBoxes = {{}};
+        
+        document.addEventListener("DOMContentLoaded", function() {{
+            window.myMap = {m.get_name()};
+            
+            // Fetch one node's path the first time it is requested
+            function loadPath(nodeId) {{
+                if (!pathData[nodeId]) {{
+                    pathData[nodeId] = fetch('/api/results/' + resultKey + '/paths/' + nodeId)
+                        .then(response => {{
+                            if (!response.ok) {{
+                                throw new Error(`HTTP ${{response.status}}: Failed to load path data`);
+                            }}
+                            return response.json();
+                        }})
+                        .catch(error => {{
+                            console.error('Error loading path data:', error);
+                            delete pathData[nodeId];
+                            if (typeof showMessage === 'function') {{
+                                showMessage('Unable to load routing data. Path visualization may be limited.', 'error');
+                            }}
+                            return null;
+                        }});
+                }}
+                return pathData[nodeId];
+            }}
+            
+            // One GeoJSON marker feature; markers already on the map are skipped
+            function addMarker(feature) {{
+                var marker = feature.properties;
+                if (markerLayers[marker.id]) return;
+                var lon = feature.geometry.coordinates[0];
+                var lat = feature.geometry.coordinates[1];
+                var color = marker.reachable ? 'blue' : 'red';
+                var radius = marker.fcc_relay ? 3 : 5;
+                
+                if (marker.is_hq) {{
+                    // Add HQ marker with windborn.png icon
+                    var hqIcon = L.icon({{
+                        iconUrl: '/static/windborn.png',
+                        iconSize: [30, 30],
+                        iconAnchor: [15, 15],
+                        popupAnchor: [0, -15]
+                    }});
+                    markerLayers[marker.id] = L.marker([lat, lon], {{icon: hqIcon}})
+                     .bindPopup("Palo Alto HQ")
+                     .addTo(window.myMap);
+                }} else {{
+                    var circleMarker = L.circleMarker([lat, lon], {{
+                        radius: radius,
+                        fillColor: color,
+                        color: 'black',
+                        weight: 2,
+                        fillOpacity: 0.8
+                    }}).bindPopup("Node " + marker.id + (marker.on_land ? " (over land)" : "") + (marker.reachable ? " - Distance: " + marker.distance.toFixed(2) + " km" : ""))
+                      .bindTooltip(lat + "," + lon + "," + marker.alt + (marker.reachable && !marker.fcc_relay ? " - Click to show path" : ""))
+                      .addTo(window.myMap);
+                    
+                    if (marker.reachable && !marker.fcc_relay) {{
+                        circleMarker.on('click', function() {{
+                            window.togglePath(marker.id);
+                        }});
+                    }}
+                    markerLayers[marker.id] = circleMarker;
+                }}
+            }}
+            
+            // Markers for the visible area, requested in boxes aligned to
+            // MARKER_BOX_DEGREES so repeated views reuse cached responses
+            function loadMarkers() {{
+                if (!resultKey) return;
+                var step = {MARKER_BOX_DEGREES};
+                var bounds = window.myMap.getBounds();
+                var bbox = [
+                    Math.floor(bounds.getWest() / step) * step,
+                    Math.max(-90, Math.floor(bounds.getSouth() / step) * step),
+                    Math.ceil(bounds.getEast() / step) * step,
+                    Math.min(90, Math.ceil(bounds.getNorth() / step) * step)
+                ].join(',');
+                if (markerBoxes[bbox]) return;
+                markerBoxes[bbox] = true;
+                fetch('/api/results/' + resultKey + '/markers?bbox=' + bbox)
+                    .then(response => {{
+                        if (!response.ok) {{
+                            throw new Error(`HTTP ${{response.status}}: Failed to load markers`);
+                        }}
+                        return response.json();
+                    }})
+                    .then(geojson => {{
+                        geojson.features.forEach(addMarker);
+                        console.log('Loaded', geojson.features.length, 'markers for', bbox);
+                    }})
+                    .catch(error => {{
+                        console.error('Error loading markers:', error);
+                        delete markerBoxes[bbox];
+                    }});
+            }}
+            
+            window.togglePath = function(nodeId) {{
+                if (activePaths[nodeId] === true) {{
+                    return;  // still loading
+                }}
+                if (activePaths[nodeId]) {{
+                    window.myMap.removeLayer(activePaths[nodeId]);
+                    delete activePaths[nodeId];
+                    return;
+                }}
+                activePaths[nodeId] = true;
+                loadPath(nodeId).then(data => {{
+                    if (!data) {{
+                        delete activePaths[nodeId];
+                        return;
+                    }}
+                    var pathLine = L.polyline(data.coords, {{
+                        color: 'green',
+                        weight: 4,
+                        opacity: 0.8,
+                    }}).bindTooltip("Node " + nodeId + "<br>Distance: " + data.distance.toFixed(2) + " km<br>Path: " + data.path_str, {{sticky: true}});
+                    pathLine.addTo(window.myMap);
+                    activePaths[nodeId] = pathLine;
+                }});
+            }};
+            
+            window.myMap.on('moveend', loadMarkers);
+            setTimeout(loadMarkers, 100);
+        }});
+    </script>
+    """))
+
+    _map_shell = m._repr_html_()
+    return _map_shell
+
+
+def bbox_mask(lat, lon, bbox):
+    """
+    Rows inside (west, south, east, north) in degrees. Longitudes may run
+    past +-180 and west > east crosses the antimeridian.
+    """
+    west, south, east, north = bbox
+    inside = (lat >= south) & (lat <= north)
+    if east - west >= 360:
+        return inside
+    west = (west + 180) % 360 - 180
+    east = (east + 180) % 360 - 180
+    if west <= east:
+        return inside & (lon >= west) & (lon <= east)
+    return inside & ((lon >= west) | (lon <= east))
+
+
+def marker_features(points, distances, bbox=None):
+    """
+    Map markers as a GeoJSON FeatureCollection, optionally limited to a
+    (west, south, east, north) box
+    """
+    selected = ~(np.isnan(points.lat) | np.isnan(points.lon))
+    if bbox is not None:
+        selected &= bbox_mask(points.lat, points.lon, bbox)
+    ids = np.nonzero(selected)[0]
+    dist, _, _ = distances.as_arrays()
+    on_land = get_land_mask().contains(points.lat[ids], points.lon[ids])
+    columns = zip(ids.tolist(), points.lat[ids].tolist(), points.lon[ids].tolist(),
+                  points.alt[ids].tolist(), (points.kind[ids] == RELAY).tolist(),
+                  distances.reachable_mask()[ids].tolist(), dist[ids].tolist(), on_land.tolist())
+    features = []
+    for id, lat, lon, alt, fcc_relay, reachable, distance, land in columns:
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {
+                'id': id,
+                'alt': alt,
+                'fcc_relay': fcc_relay,
+                'reachable': reachable,
+                'is_hq': (id == 0),
+                'distance': distance,
+                'on_land': land
+            }
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def get_fcc_facility_names(points):
+    """Short labels for FCC relay nodes, keyed by node id"""
+    fcc_start = points.fcc_start
+    if fcc_start < 0:
+        return {}
+    catalog = get_relay_catalog()
+    rows = points.relay_rows.tolist() if points.relay_rows is not None else range(points.count(RELAY))
+    return {fcc_start + i: catalog.label(row) for i, row in enumerate(rows)}
+
+
+def build_path_data(points, distances, fcc_facility_names, nodes=None):
+    """
+    Rebuild coords, distance and a readable path string for reachable nodes.
+    Only the requested nodes are reconstructed (all of them when nodes is None).
+    """
+    path_data = {}
+    lats = points.lat.tolist()
+    lons = points.lon.tolist()
+    for id in (range(len(points)) if nodes is None else nodes):
+        if id == 0 or not distances.reachable(id):
+            continue
+        path_nodes = distances.route(id)
+        path_coords = [[lats[n], lons[n]] for n in path_nodes]
+
+        # Create descriptive path string
+        path_labels = []
+        for n in path_nodes:
+            if n == 0:
+                path_labels.append("HQ")
+            elif n in fcc_facility_names:
+                path_labels.append(fcc_facility_names[n])
+            else:
+                path_labels.append(f"Satellite {n}")
+
+        path_str = " > ".join(path_labels)
+        path_data[id] = {
+            'coords': path_coords,
+            'distance': distances.distance(id),
+            'path_str': path_str,
+            'lat': lats[id],
+            'lon': lons[id]
+        }
+    return path_data
+
+
+def compute_metrics(points, distances, fcc_start):
+    """Network performance metrics for the dashboard sidebar"""
+    dist, _, hops = distances.as_arrays()
+    reached = distances.reachable_mask()
+    reached[0] = False  # HQ
+    total_satellites = points.count(BALLOON)
+    total_fcc_relays = points.count(RELAY)
+    reachable_satellites = int((reached & (points.kind == BALLOON)).sum())
+    
+    # Calculate average hop count
+    if reached.any():
+        hop_counts = hops[reached]
+        avg_hops = float(hop_counts.mean())
+        max_hops = int(hop_counts.max())
+        min_hops = int(hop_counts.min())
+    else:
+        avg_hops = max_hops = min_hops = 0
+    
+    # Calculate network coverage percentage
+    coverage_percent = (reachable_satellites / total_satellites * 100) if total_satellites > 0 else 0
+    
+    # Find longest and shortest distances
+    if reached.any():
+        distances_km = dist[reached]
+        max_distance = float(distances_km.max())
+        min_distance = float(distances_km.min())
+        avg_distance = float(distances_km.mean())
+    else:
+        max_distance = min_distance = avg_distance = 0
+    
+    return {
+        'total_satellites': total_satellites,
+        'total_fcc_relays': total_fcc_relays,
+        'reachable_satellites': reachable_satellites,
+        'coverage_percent': round(coverage_percent, 1),
+        'avg_hops': round(avg_hops, 1),
+        'max_hops': max_hops,
+        'min_hops': min_hops,
+        'max_distance': round(max_distance, 1),
+        'min_distance': round(min_distance, 1),
+        'avg_distance': round(avg_distance, 1)
+    }
+
+
+def ground_stations(points):
+    """HQ plus every FCC relay, as node ids"""
+    return [0] + np.nonzero(points.kind == RELAY)[0].tolist()
+
+
+def build_station_data(points, stations, fcc_facility_names):
+    """
+    Nearest ground station for every balloon that can reach one, as columns:
+    node ids, the serving station and its label, route distance and hops
+    """
+    dist, _, hops = stations.as_arrays()
+    origins = stations.origins()
+    nodes = np.nonzero((points.kind == BALLOON) & (origins >= 0))[0]
+    station = origins[nodes].tolist()
+    return {
+        'node': nodes.tolist(),
+        'station': station,
+        'station_label': ["HQ" if s == 0 else fcc_facility_names.get(s, f"Node {s}") for s in station],
+        'distance': dist[nodes].tolist(),
+        'hops': hops[nodes].tolist(),
+    }
+
+
+def compute_result(snapshot, max_range, jack_enabled, key, trace=None):
+    """
+    Run the full graph build, routing and metrics pipeline, timing each
+    stage into trace (a telemetry.StageTrace) when given
+    """
+    if len(snapshot) == 0:
+        return None
+    trace = trace or StageTrace()
+    if max_range <= MAX_RANGE_KM:
+        with trace.stage('relay_load'):
+            points = get_point_set(snapshot, jack_enabled)
+        with trace.stage('graph_build'):
+            graph = get_range_graph(snapshot, points, jack_enabled)
+        trace.count('edges', graph.edge_count(max_range))
+        with trace.stage('dijkstra'):
+            distances = graph.shortest_paths(max_range)
+    else:
+        with trace.stage('relay_load'):
+            points = build_point_set(snapshot.coords, jack_enabled, max_range)
+        with trace.stage('graph_build'):
+            graph = sharded_neighbor_lists(points.xyz, max_range)
+        trace.count('edges', sum(len(neighbors) for neighbors in graph))
+        with trace.stage('dijkstra'):
+            distances = dijkstra(graph)
+    trace.count('heap_pops', distances.heap_pops)
+    fcc_start = points.fcc_start
+    with trace.stage('metrics'):
+        fcc_names = get_fcc_facility_names(points)
+        metrics = compute_metrics(points, distances, fcc_start)
+    return RoutingResult(points, distances, fcc_start, fcc_names, metrics, key=key)
+
+
+def compute_stations(points, max_range):
+    """
+    Nearest ground station for every node of a routed point set, from one
+    multi-source run; only requested through /api/results/<key>/stations
+    """
+    sources = ground_stations(points)
+    if max_range <= MAX_RANGE_KM:
+        return RangeGraph(points, max_range).shortest_paths(max_range, sources=sources)
+    return multi_source_dijkstra(sharded_neighbor_lists(points.xyz, max_range), sources)
+
+
+def compute_timeline(snapshots, max_range, jack_enabled):
+    """
+    Time-expanded routing over (hours ago, snapshot) pairs, oldest first,
+    reusing each hour's cached point set and range graph
+    """
+    if max_range > MAX_RANGE_KM:
+        raise ValueError(f"time-expanded routing supports ranges up to {MAX_RANGE_KM} km")
+    graphs = [get_range_graph(snapshot, get_point_set(snapshot, jack_enabled), jack_enabled)
+              for _, snapshot in snapshots]
+    return TimeExpandedGraph([hours for hours, _ in snapshots], graphs, max_range)
+
+
+def compute_coverage(snapshot, jack_enabled):
+    """Coverage-vs-range curve for a snapshot, from its cached range graph"""
+    return get_range_graph(snapshot, get_point_set(snapshot, jack_enabled), jack_enabled).coverage_curve()
+
+
+def compute_metrics_cube(snapshots, jack_enabled, path=None, relay_version=""):
+    """
+    Dashboard metrics for every (hours ago, snapshot) pair and range bucket.
+    Rows of the cube saved at path are reused for unchanged snapshots built
+    over the same relay catalog, and the new cube is saved back there.
+    """
+    previous = MetricsCube.load(path) if path else None
+    if previous is not None and (previous.jack_enabled != jack_enabled
+                                 or previous.relay_version != relay_version):
+        previous = None
+    ranges = range_buckets()
+    values = np.zeros((len(snapshots), len(ranges), len(METRIC_FIELDS)), dtype=np.float32)
+    for i, (hours, snapshot) in enumerate(snapshots):
+        row = previous.row(snapshot.version) if previous is not None else None
+        if row is not None and row.shape == values[i].shape:
+            values[i] = row
+            continue
+        points = get_point_set(snapshot, jack_enabled)
+        graph = get_range_graph(snapshot, points, jack_enabled)
+        # Ascending ranges, so each Dijkstra extends the previous one
+        for j, max_range in enumerate(ranges.tolist()):
+            metrics = compute_metrics(points, graph.shortest_paths(max_range), points.fcc_start)
+            values[i, j] = [metrics[field] for field in METRIC_FIELDS]
+    cube = MetricsCube([hours for hours, _ in snapshots], [snapshot.version for _, snapshot in snapshots],
+                       ranges, values, jack_enabled, relay_version)
+    if path:
+        cube.save(path)
+    return cube
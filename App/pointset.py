@@ -0,0 +1,79 @@
+"""
+Columnar point storage shared by graph building, routing, metrics and
+rendering.
+
+A PointSet holds one snapshot's nodes as parallel typed arrays instead of
+mutable [lat, lon, alt, id] lists: node 0 is HQ, then the balloons in
+upstream row order, then any relays. The node id is the row index.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from geometry import ecef
+
+HQ = 0
+BALLOON = 1
+RELAY = 2
+
+PALO_ALTO_OFFICE = (37.419, -122.106, 0.0)
+
+
+class PointSet:
+    """
+    Parallel lat/lon/alt, ECEF xyz, node kind and validity arrays.
+    relay_rows, when known, holds the relay catalog row of each relay node.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, alt: np.ndarray, kind: np.ndarray,
+                 relay_rows: Optional[np.ndarray] = None):
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+        self.lon = np.ascontiguousarray(lon, dtype=np.float64)
+        self.alt = np.ascontiguousarray(alt, dtype=np.float64)
+        self.kind = np.ascontiguousarray(kind, dtype=np.int8)
+        self.valid = np.isfinite(self.lat) & np.isfinite(self.lon) & np.isfinite(self.alt)
+        self.xyz = ecef(self.lat, self.lon, self.alt)
+        self.xyz[~self.valid] = np.nan
+        self.relay_rows = relay_rows
+
+    @classmethod
+    def build(cls, balloons: np.ndarray, relays: Optional[np.ndarray] = None,
+              hq=PALO_ALTO_OFFICE, relay_rows: Optional[np.ndarray] = None) -> "PointSet":
+        """
+        HQ, then balloon rows, then relay rows; both inputs are (n, 3)
+        [lat, lon, alt] arrays.
+        """
+        parts = [np.asarray([hq], dtype=np.float64), np.asarray(balloons, dtype=np.float64).reshape(-1, 3)]
+        kinds = [np.full(1, HQ), np.full(len(parts[1]), BALLOON)]
+        if relays is not None:
+            parts.append(np.asarray(relays, dtype=np.float64).reshape(-1, 3))
+            kinds.append(np.full(len(parts[2]), RELAY))
+        coords = np.concatenate(parts)
+        return cls(coords[:, 0], coords[:, 1], coords[:, 2], np.concatenate(kinds), relay_rows)
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    @property
+    def fcc_start(self) -> int:
+        """
+        Id of the first relay node, or -1 when relays are not included.
+        """
+        relays = np.nonzero(self.kind == RELAY)[0]
+        return int(relays[0]) if len(relays) else -1
+
+    def count(self, kind: int) -> int:
+        return int((self.kind == kind).sum())
+
+    def approx_bytes(self) -> int:
+        return (self.lat.nbytes + self.lon.nbytes + self.alt.nbytes + self.xyz.nbytes
+                + self.kind.nbytes + self.valid.nbytes
+                + (self.relay_rows.nbytes if self.relay_rows is not None else 0))
+
+    def as_lists(self) -> list:
+        """
+        Legacy [lat, lon, alt, id] rows.
+        """
+        return [[lat, lon, alt, id] for id, (lat, lon, alt)
+                in enumerate(zip(self.lat.tolist(), self.lon.tolist(), self.alt.tolist()))]
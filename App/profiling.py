@@ -0,0 +1,124 @@
+"""
+Opt-in profiling of single requests.
+
+A slow hour/range combination can be profiled without patching the app:
+send the request with an X-Profile header holding PROFILE_TOKEN, or, with
+PROFILING=1 set for a local run, add ?profile=1. The request then runs
+under a profiler and the profile is written to PROFILE_DIR; its file name
+comes back in the X-Profile-File response header.
+
+Two output formats:
+  pstats     cProfile's deterministic profile, for pstats or snakeviz
+  collapsed  sampled stacks, one "frame;frame;frame count" line each, for
+             flamegraph.pl or speedscope
+
+Profiling is off unless PROFILE_TOKEN or PROFILING is set in the
+environment, and requested_format() then returns without looking at the
+request, so unprofiled requests pay nothing measurable.
+"""
+
+import cProfile
+import hmac
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Optional, Tuple
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "profiles")
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+PROFILING = os.environ.get("PROFILING") == "1"
+
+FORMATS = ('pstats', 'collapsed')
+SAMPLE_INTERVAL = 0.002  # seconds between stack samples in collapsed mode
+
+ENABLED = PROFILING or PROFILE_TOKEN is not None
+
+_sequence = itertools.count()
+
+
+def requested_format(headers, args) -> Optional[str]:
+    """
+    Output format the request asked to be profiled with, or None. The
+    X-Profile header takes "TOKEN" or "TOKEN:collapsed"; ?profile=1 or
+    ?profile=collapsed is honoured when PROFILING is on.
+    """
+    if not ENABLED:
+        return None
+    header = headers.get("X-Profile")
+    if header and PROFILE_TOKEN is not None:
+        token, _, fmt = header.partition(":")
+        if hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+            return fmt if fmt in FORMATS else FORMATS[0]
+    value = args.get("profile")
+    if value and PROFILING:
+        return value if value in FORMATS else FORMATS[0]
+    return None
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack every interval seconds from a
+    background thread and counts the collapsed stacks.
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def profile_call(fmt: str, name: str, fn: Callable, *args) -> Tuple[object, str]:
+    """
+    Run fn(*args) under the profiler for fmt and write the profile to
+    PROFILE_DIR; returns fn's result and the profile's file name.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stem = (f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence)}-"
+            f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)}")
+    if fmt == 'collapsed':
+        filename = stem + ".folded"
+        with StackSampler(threading.get_ident()) as sampler:
+            result = fn(*args)
+        sampler.write(os.path.join(PROFILE_DIR, filename))
+    else:
+        filename = stem + ".prof"
+        profiler = cProfile.Profile()
+        result = profiler.runcall(fn, *args)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+    print(f"Wrote profile {os.path.join(PROFILE_DIR, filename)}")
+    return result, filename
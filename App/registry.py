@@ -0,0 +1,188 @@
+"""
+Routing results shared between worker processes.
+
+Every result is addressed by a content hash of the inputs that determine it
+(snapshot version, hour, range, relay flag). The page embeds that key and the
+path and marker endpoints look results up by it, so any gunicorn worker or thread can
+answer for a page another one rendered. Results are stored in a local SQLite
+database as packed arrays; a worker that never computed a result loads it
+from there instead of recomputing.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Optional
+
+import numpy as np
+
+from pointset import PointSet
+from results import RoutingResult
+from routing import ShortestPaths
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "result_registry.sqlite")
+DEFAULT_MAX_RESULTS = 256
+BUSY_TIMEOUT = 10  # seconds a writer waits for another worker's transaction
+
+# Bumped whenever the table layout changes; stored results are only a cache,
+# so an outdated table is dropped and rebuilt
+SCHEMA_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    hour INTEGER NOT NULL,
+    max_range REAL NOT NULL,
+    jack INTEGER NOT NULL,
+    snapshot_version TEXT NOT NULL,
+    used_at REAL NOT NULL,
+    source INTEGER NOT NULL,
+    fcc_start INTEGER NOT NULL,
+    lat BLOB NOT NULL,
+    lon BLOB NOT NULL,
+    alt BLOB NOT NULL,
+    kind BLOB NOT NULL,
+    dist BLOB NOT NULL,
+    pred BLOB NOT NULL,
+    hops BLOB NOT NULL,
+    fcc_names TEXT NOT NULL,
+    metrics TEXT NOT NULL,
+    stations TEXT,
+    station_dist BLOB,
+    station_pred BLOB,
+    station_hops BLOB
+)
+"""
+
+_COLUMNS = ("key, hour, max_range, jack, snapshot_version, used_at, source, fcc_start, "
+            "lat, lon, alt, kind, dist, pred, hops, fcc_names, metrics, "
+            "stations, station_dist, station_pred, station_hops")
+
+
+def result_key(snapshot_version: str, hour: int, max_range, jack_enabled: bool,
+               relay_version: str = "") -> str:
+    """
+    Content hash naming the routing result for these inputs. relay_version
+    is the relay catalog's, which only matters with relays enabled.
+    """
+    text = f"{snapshot_version}:{hour}:{max_range!r}:{int(jack_enabled)}"
+    if jack_enabled and relay_version:
+        text += f":{relay_version}"
+    return hashlib.sha1(text.encode()).hexdigest()[:20]
+
+
+def _station_columns(stations: Optional[ShortestPaths]) -> tuple:
+    if stations is None:
+        return (None, None, None, None)
+    return (json.dumps(stations.sources), stations.dist.tobytes(),
+            stations.pred.tobytes(), stations.hops.tobytes())
+
+
+class ResultRegistry:
+    """
+    SQLite-backed result store keyed by result_key, safe to open from many
+    processes at once. Least recently used results beyond max_results are
+    pruned on insert.
+    """
+
+    def __init__(self, path: str = REGISTRY_PATH, max_results: int = DEFAULT_MAX_RESULTS):
+        self.path = path
+        self.max_results = max_results
+        self._local = threading.local()
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                connection.execute("DROP TABLE IF EXISTS results")
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.execute(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def put(self, result: RoutingResult, hour: int, max_range, jack_enabled: bool,
+            snapshot_version: str):
+        points = result.points
+        distances = result.distances
+        row = (result.key, hour, max_range, int(jack_enabled), snapshot_version, time.time(),
+               distances.source, result.fcc_start,
+               points.lat.tobytes(), points.lon.tobytes(), points.alt.tobytes(), points.kind.tobytes(),
+               distances.dist.tobytes(), distances.pred.tobytes(), distances.hops.tobytes(),
+               json.dumps({str(id): name for id, name in result.fcc_names.items()}),
+               json.dumps(result.metrics)) + _station_columns(result.stations)
+        try:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute(f"INSERT OR REPLACE INTO results ({_COLUMNS}) "
+                                   f"VALUES ({', '.join('?' * len(row))})", row)
+                connection.execute("DELETE FROM results WHERE key NOT IN "
+                                   "(SELECT key FROM results ORDER BY used_at DESC LIMIT ?)",
+                                   (self.max_results,))
+        except sqlite3.Error as e:
+            print(f"Could not register result {result.key}: {e}")
+
+    def put_stations(self, key: str, stations: ShortestPaths) -> bool:
+        """
+        Attach nearest-station routing to a stored result; False if it is
+        not stored.
+        """
+        try:
+            cursor = self._connect().execute(
+                "UPDATE results SET stations = ?, station_dist = ?, station_pred = ?, station_hops = ? "
+                "WHERE key = ?", _station_columns(stations) + (key,))
+        except sqlite3.Error as e:
+            print(f"Could not register stations for {key}: {e}")
+            return False
+        return cursor.rowcount > 0
+
+    def touch(self, key: str) -> bool:
+        """
+        Mark a result as recently used; False if it is not stored.
+        """
+        try:
+            cursor = self._connect().execute("UPDATE results SET used_at = ? WHERE key = ?",
+                                             (time.time(), key))
+        except sqlite3.Error as e:
+            print(f"Could not touch result {key}: {e}")
+            return False
+        return cursor.rowcount > 0
+
+    def get(self, key: str) -> Optional[RoutingResult]:
+        try:
+            row = self._connect().execute(
+                "SELECT hour, max_range, jack, source, fcc_start, lat, lon, alt, kind, dist, pred, hops, "
+                "fcc_names, metrics, stations, station_dist, station_pred, station_hops "
+                "FROM results WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Could not load result {key}: {e}")
+            return None
+        if row is None:
+            return None
+        (hour, max_range, jack, source, fcc_start, lat, lon, alt, kind, dist, pred, hops, fcc_names, metrics,
+         station_sources, station_dist, station_pred, station_hops) = row
+        points = PointSet(np.frombuffer(lat), np.frombuffer(lon), np.frombuffer(alt),
+                          np.frombuffer(kind, dtype=np.int8))
+        distances = ShortestPaths(source, array('d', dist), array('l', pred), array('l', hops))
+        stations = None
+        if station_sources is not None:
+            station_sources = json.loads(station_sources)
+            stations = ShortestPaths(station_sources[0], array('d', station_dist), array('l', station_pred),
+                                     array('l', station_hops), station_sources)
+        return RoutingResult(points, distances, fcc_start,
+                             {int(id): name for id, name in json.loads(fcc_names).items()},
+                             json.loads(metrics), key=key, stations=stations,
+                             query=(hour, max_range, bool(jack)))
+
+    def keys(self) -> list:
+        return [key for key, in self._connect().execute("SELECT key FROM results ORDER BY used_at DESC")]
@@ -0,0 +1,144 @@
+"""
+FCC relay catalog, loaded once per process.
+
+fcc_facilities.json used to be parsed on every graph build and again for the
+node labels. The catalog reads it once into parallel arrays with the ECEF
+positions and labels precomputed, and buckets the relays into a coarse 3D
+grid so the relays near a snapshot's balloons are found with a few sorted
+lookups instead of a distance to every relay. When fcc_ingest.py has
+written a relay file from the full ASR dump, that file is memory-mapped
+instead, with positions and labels already computed.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from fcc_ingest import FEET_PER_METER, RELAY_FILE, load_relays
+from geometry import ecef
+from neighbors import GridIndex, grid_index, grid_query_points
+
+FCC_FACILITIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fcc_facilities.json")
+
+# Relay grids kept per catalog, one per search range; ranges are client
+# supplied, so only the most recently used few are kept
+GRID_CACHE_SIZE = 4
+
+
+def file_version(path: str) -> str:
+    """
+    Version of a relay source file from its name, size and modification
+    time, so a re-ingested catalog gets new result keys without hashing a
+    dump of millions of rows.
+    """
+    stat = os.stat(path)
+    text = f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def facility_label(facility: dict) -> str:
+    """Short node label, e.g. "Earth Station (New York, NY)" """
+    short_name = facility['name'].split(' - ')[0]
+    return f"{facility['type']} ({short_name})"
+
+
+class RelayCatalog:
+    """
+    Parallel lat/lon/alt, ECEF xyz and label arrays for every relay site.
+    alt holds the structure height converted from feet, as graph nodes have
+    always used it. labels is a list of str, or of UTF-8 bytes when mapped
+    from a relay file. version identifies the source the catalog was read
+    from.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, alt: np.ndarray, labels,
+                 xyz: Optional[np.ndarray] = None, version: str = ""):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.alt = np.asarray(alt, dtype=np.float64)
+        self.labels = labels
+        self.version = version
+        self.xyz = ecef(self.lat, self.lon, self.alt) if xyz is None else xyz
+        self._grids = OrderedDict()  # max_range -> GridIndex over xyz, LRU
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str = FCC_FACILITIES_PATH) -> "RelayCatalog":
+        with open(path, "r") as f:
+            facilities = json.load(f)
+        return cls(np.array([facility['lat'] for facility in facilities], dtype=np.float64),
+                   np.array([facility['lon'] for facility in facilities], dtype=np.float64),
+                   np.array([facility.get('height', 0) / FEET_PER_METER for facility in facilities],
+                            dtype=np.float64),
+                   [facility_label(facility) for facility in facilities], version=file_version(path))
+
+    @classmethod
+    def from_records(cls, records: np.ndarray, version: str = "") -> "RelayCatalog":
+        """Catalog over fcc_ingest relay records, without copying them"""
+        return cls(records['lat'], records['lon'], records['alt'], records['label'], records['xyz'],
+                   version)
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def label(self, row: int) -> str:
+        label = self.labels[row]
+        return label.decode('utf-8', 'ignore') if isinstance(label, bytes) else label
+
+    def approx_bytes(self) -> int:
+        # Memory-mapped fields are paged in by the OS and not counted
+        resident = [array for array in (self.lat, self.lon, self.alt, self.xyz)
+                    if not isinstance(array.base, np.memmap)]
+        return sum(array.nbytes for array in resident) + (
+            sum(len(label) for label in self.labels) if isinstance(self.labels, list) else 0)
+
+    def coords(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(n, 3) [lat, lon, alt] rows for PointSet.build; all relays by default."""
+        rows = slice(None) if rows is None else rows
+        return np.column_stack((self.lat[rows], self.lon[rows], self.alt[rows]))
+
+    def _grid(self, max_range: float) -> Optional[GridIndex]:
+        with self._lock:
+            if max_range in self._grids:
+                self._grids.move_to_end(max_range)
+                return self._grids[max_range]
+            grid = self._grids[max_range] = grid_index(self.xyz, max_range, min_points=1)
+            while len(self._grids) > GRID_CACHE_SIZE:
+                self._grids.popitem(last=False)
+            return grid
+
+    def near(self, xyz: np.ndarray, max_range: float) -> np.ndarray:
+        """
+        Catalog rows, ascending, of the relays within max_range of at least
+        one finite row of xyz. Only relays in the 27 grid cells around each
+        point are measured.
+        """
+        found = np.zeros(len(self), dtype=bool)
+        grid = self._grid(float(max_range)) if max_range > 0 else None
+        if grid is not None:
+            for _, rows, _ in grid_query_points(xyz, self.xyz, grid, max_range):
+                found[rows] = True
+        return np.nonzero(found)[0]
+
+
+_catalog: Optional[RelayCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_relay_catalog() -> RelayCatalog:
+    """
+    The shared catalog, loaded on first use: memory-mapped from the relay
+    file if fcc_ingest.py wrote one, else read from fcc_facilities.json.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            records = load_relays()
+            _catalog = (RelayCatalog.from_records(records, file_version(RELAY_FILE)) if records is not None
+                        else RelayCatalog.load())
+        return _catalog
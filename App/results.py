@@ -0,0 +1,96 @@
+"""
+Memoized routing results.
+
+A routing result depends only on the snapshot contents, the range and the
+relay flag, so repeated slider values can reuse the whole graph build,
+Dijkstra and metrics instead of recomputing them.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Hashable
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class RoutingResult:
+    """
+    Everything index() and /api/paths need for one (snapshot, range, relays).
+    """
+
+    def __init__(self, points, distances, fcc_start, fcc_names, metrics, key=None, stations=None,
+                 query=None):
+        self.key = key
+        # (hour, max_range, jack_enabled) the result was computed for, when known
+        self.query = query
+        # Multi-source paths from HQ and the relays (nearest ground station
+        # per balloon); computed on first request, and only with relays
+        self.stations = stations
+        self.points = points
+        self.distances = distances
+        self.fcc_start = fcc_start
+        self.fcc_names = fcc_names
+        self.metrics = metrics
+
+    def approx_bytes(self) -> int:
+        """
+        Rough memory footprint used for cache accounting.
+        """
+        per_node = 3 * 8 * (2 if self.stations is not None else 1)  # routing arrays; the PointSet is shared with the graph cache
+        return len(self.points) * per_node + len(self.fcc_names) * 64
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate size, with
+    hit/miss counters. Values must provide approx_bytes().
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Membership test only; does not count as a hit or refresh recency
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: Hashable, value):
+        size = value.approx_bytes()
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                              or self.bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+            }
@@ -0,0 +1,188 @@
+"""
+Shortest-path routing over the satellite neighbor graph.
+
+Dijkstra keeps one predecessor and one distance per node in flat arrays
+instead of copying the whole path list on every relaxation. Paths are only
+rebuilt when a caller asks for a particular node.
+"""
+
+import heapq
+from array import array
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+INF = float('inf')
+
+
+class ShortestPaths:
+    """
+    Shortest paths from one source, or from the nearest of several, stored
+    as predecessor/distance/hop arrays.
+
+    Indexing keeps the (path, distance) shape the old djikstra() returned:
+    path lists the nodes from the source up to, but excluding, the node itself
+    and is empty for a source and for unreachable nodes.
+    """
+
+    def __init__(self, source: int, dist: array, pred: array, hops: array,
+                 sources: Optional[Sequence[int]] = None, heap_pops: int = 0):
+        self.source = source
+        self.sources = tuple(sources) if sources is not None else (source,)
+        self._source_set = frozenset(self.sources)
+        self.dist = dist
+        self.pred = pred
+        self.hops = hops
+        # Heap pops of the run that produced these paths (pushes are equal,
+        # as the heap is drained), for instrumentation
+        self.heap_pops = heap_pops
+
+    def __len__(self) -> int:
+        return len(self.dist)
+
+    def __getitem__(self, node: int) -> Tuple[List[int], float]:
+        return (self.path_to(node), self.dist[node])
+
+    def __iter__(self) -> Iterator[Tuple[List[int], float]]:
+        for node in range(len(self.dist)):
+            yield self[node]
+
+    def reachable(self, node: int) -> bool:
+        return self.pred[node] >= 0 or node in self._source_set
+
+    def distance(self, node: int) -> float:
+        return self.dist[node]
+
+    def as_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        dist, pred and hops as read-only numpy views (no copy).
+        """
+        return tuple(np.frombuffer(values, dtype=np.dtype(values.typecode))
+                     for values in (self.dist, self.pred, self.hops))
+
+    def reachable_mask(self) -> np.ndarray:
+        """
+        Boolean array, True for the source and every node with a route.
+        """
+        mask = np.frombuffer(self.pred, dtype=np.dtype(self.pred.typecode)) >= 0
+        mask[list(self.sources)] = True
+        return mask
+
+    def origins(self) -> np.ndarray:
+        """
+        The source each node's shortest path starts from (-1 if unreachable),
+        for every node at once, by pointer jumping over pred.
+        """
+        pred = np.frombuffer(self.pred, dtype=np.dtype(self.pred.typecode))
+        root = np.where(pred >= 0, pred, np.arange(len(pred)))
+        while True:
+            jumped = root[root]
+            if np.array_equal(jumped, root):
+                break
+            root = jumped
+        root[~self.reachable_mask()] = -1
+        return root
+
+    def path_to(self, node: int) -> List[int]:
+        """
+        Nodes from the source up to the node's predecessor.
+        """
+        path = []
+        current = self.pred[node]
+        while current >= 0:
+            path.append(current)
+            current = self.pred[current]
+        path.reverse()
+        return path
+
+    def route(self, node: int) -> List[int]:
+        """
+        Full hop sequence from the source to node, or [] if unreachable.
+        """
+        if not self.reachable(node):
+            return []
+        return self.path_to(node) + [node]
+
+
+def _relax(graph, dist: array, pred: array, hops: array, priority_queue: list) -> int:
+    """
+    Dijkstra main loop over an already seeded (distance, node) heap; returns
+    the number of heap pops.
+    """
+    pops = 0
+    while(priority_queue):
+        current_distance, current_node = heapq.heappop(priority_queue)
+        pops += 1
+        # Skip if we already found a shorter path
+        if current_distance > dist[current_node]:
+            continue
+
+        next_hops = hops[current_node] + 1
+        for neighbor, weight in graph[current_node]:
+            distance = current_distance + weight
+            if distance < dist[neighbor]:
+                dist[neighbor] = distance
+                pred[neighbor] = current_node
+                hops[neighbor] = next_hops
+                heapq.heappush(priority_queue, (distance, neighbor))
+    return pops
+
+
+def dijkstra(graph, start: int = 0) -> ShortestPaths:
+    """
+    Shortest paths from start over an adjacency list of (neighbor, weight).
+    """
+    n = len(graph)
+    dist = array('d', [INF]) * n
+    pred = array('l', [-1]) * n
+    hops = array('l', [0]) * n
+    dist[start] = 0
+
+    # Min-heap priority queue: (distance, node)
+    pops = _relax(graph, dist, pred, hops, [(0, start)])
+    return ShortestPaths(start, dist, pred, hops, heap_pops=pops)
+
+
+def multi_source_dijkstra(graph, sources: Iterable[int]) -> ShortestPaths:
+    """
+    Shortest paths to every node from whichever of sources is nearest, in a
+    single pass: all sources start at distance 0. origin()/origins() tell
+    which source each node is served by.
+    """
+    sources = list(dict.fromkeys(sources))
+    if not sources:
+        raise ValueError("multi_source_dijkstra needs at least one source")
+    n = len(graph)
+    dist = array('d', [INF]) * n
+    pred = array('l', [-1]) * n
+    hops = array('l', [0]) * n
+    for source in sources:
+        dist[source] = 0
+
+    pops = _relax(graph, dist, pred, hops, [(0, source) for source in sources])
+    return ShortestPaths(sources[0], dist, pred, hops, sources, pops)
+
+
+def dijkstra_add_edges(graph, previous: ShortestPaths, new_edges) -> ShortestPaths:
+    """
+    Update previous after the (src, dst, weight) edges in new_edges were added.
+
+    graph is the adjacency list including the new edges. Adding edges can only
+    shorten paths, so only nodes improved by a new edge and their descendants
+    are revisited instead of re-running Dijkstra from the source.
+    """
+    dist = array('d', previous.dist)
+    pred = array('l', previous.pred)
+    hops = array('l', previous.hops)
+
+    priority_queue = []
+    for u, v, weight in new_edges:
+        distance = dist[u] + weight
+        if distance < dist[v]:
+            dist[v] = distance
+            pred[v] = u
+            hops[v] = hops[u] + 1
+            priority_queue.append((distance, v))
+    heapq.heapify(priority_queue)
+    pops = _relax(graph, dist, pred, hops, priority_queue)
+    return ShortestPaths(previous.source, dist, pred, hops, previous.sources, pops)
@@ -0,0 +1,185 @@
+"""
+Neighbor search sharded across processes.
+
+The grid index is built once in the parent and published, together with the
+ECEF positions, as shared-memory arrays, so worker processes attach to them
+by name instead of receiving pickled copies. Each shard answers grid_query
+for one contiguous block of query rows; shards come back already ordered by
+source node and are concatenated into the same (i, j, distance) arrays
+grid_pairs returns.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from geometry import DEFAULT_BLOCK_BYTES
+from neighbors import EMPTY_PAIRS, GridIndex, grid_index, grid_pairs, grid_query, to_neighbor_lists
+
+# Below this many points the fork/attach/merge overhead outweighs the win
+SHARD_MIN_POINTS = 20000
+
+# Shards per worker: a few more shards than workers evens out dense regions
+SHARDS_PER_WORKER = 4
+
+_GRID_FIELDS = ('idx', 'keys', 'sorted_keys', 'sorted_idx')
+
+# Pools reused across calls, keyed by worker count
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+# Shard workers per calling process; None for one per core
+_default_workers: Optional[int] = None
+
+
+def default_workers() -> int:
+    return _default_workers or os.cpu_count() or 1
+
+
+def set_default_workers(workers: Optional[int]):
+    """
+    Limit the shard pool of this process, e.g. to its share of the cores
+    when several compute workers each shard their own searches.
+    """
+    global _default_workers
+    _default_workers = workers
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool with this many workers, created on first use and reused.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            context = None
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return pool
+
+
+def shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+class SharedArrays:
+    """
+    Copies of numpy arrays in named shared-memory segments, unlinked on
+    close(). spec() describes them for worker processes: field ->
+    (segment name, shape, dtype).
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self._segments: List[shared_memory.SharedMemory] = []
+        self._spec = {}
+        try:
+            for field, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._segments.append(segment)
+                np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+                self._spec[field] = (segment.name, array.shape, array.dtype.str)
+        except BaseException:
+            self.close()
+            raise
+
+    def spec(self) -> dict:
+        return dict(self._spec)
+
+    def close(self):
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _query_shard(spec: dict, base: int, max_distance: float, start: int, stop: int,
+                 max_bytes: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    grid_query for one block of rows, run in a worker process against the
+    parent's shared arrays. The returned arrays are copies, so the segments
+    can be unmapped before returning.
+    """
+    segments = [shared_memory.SharedMemory(name=name) for name, _, _ in spec.values()]
+    try:
+        arrays = {field: np.ndarray(shape, np.dtype(dtype), buffer=segment.buf)
+                  for (field, (_, shape, dtype)), segment in zip(spec.items(), segments)}
+        grid = GridIndex(*(arrays[field] for field in _GRID_FIELDS), base)
+        pairs = grid_query(arrays['xyz'], grid, max_distance, start, stop, max_bytes)
+        del arrays, grid
+    finally:
+        for segment in segments:
+            segment.close()
+    return pairs
+
+
+def shard_bounds(n: int, shards: int) -> List[Tuple[int, int]]:
+    edges = np.linspace(0, n, max(1, min(shards, n)) + 1).astype(int).tolist()
+    return [(lo, hi) for lo, hi in zip(edges[:-1], edges[1:]) if hi > lo]
+
+
+def sharded_grid_pairs(xyz: np.ndarray, max_distance: float, workers: Optional[int] = None,
+                       shards: Optional[int] = None,
+                       max_bytes: int = DEFAULT_BLOCK_BYTES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    grid_pairs computed by a pool of worker processes; the result is
+    identical. max_bytes bounds each shard's temporaries.
+    """
+    workers = workers or default_workers()
+    grid = grid_index(xyz, max_distance)
+    if grid is None:
+        return EMPTY_PAIRS
+    if workers <= 1:
+        return grid_query(xyz, grid, max_distance, max_bytes=max_bytes)
+
+    pool = get_pool(workers)
+    arrays = {field: getattr(grid, field) for field in _GRID_FIELDS}
+    arrays['xyz'] = xyz
+    with SharedArrays(arrays) as shared:
+        spec = shared.spec()
+        bounds = shard_bounds(len(grid.idx), shards or workers * SHARDS_PER_WORKER)
+        futures = [pool.submit(_query_shard, spec, grid.base, max_distance, lo, hi, max_bytes)
+                   for lo, hi in bounds]
+        pieces = [future.result() for future in futures]
+
+    pieces = [piece for piece in pieces if len(piece[0])]
+    if not pieces:
+        return EMPTY_PAIRS
+    return tuple(np.concatenate(column) for column in zip(*pieces))
+
+
+def sharded_pairs(xyz: np.ndarray, max_distance: float,
+                  workers: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    grid_pairs, with the search sharded across processes for large point
+    sets. Edges come back ordered by (source, destination) either way.
+    """
+    workers = workers or default_workers()
+    if workers <= 1 or len(xyz) < SHARD_MIN_POINTS:
+        return grid_pairs(xyz, max_distance)
+    return sharded_grid_pairs(xyz, max_distance, workers)
+
+
+def sharded_neighbor_lists(xyz: np.ndarray, max_distance: float, workers: Optional[int] = None):
+    """
+    xyz_neighbor_lists with the pair search sharded across processes for
+    large point sets.
+    """
+    return to_neighbor_lists(len(xyz), *sharded_pairs(xyz, max_distance, workers))
@@ -0,0 +1,309 @@
+"""
+Cached access to the hourly treasure snapshots.
+
+Parsed snapshots are kept in memory with a TTL and LRU eviction, and written
+to a local on-disk store so a restart does not have to re-download every hour.
+Expired entries are revalidated with ETag / If-Modified-Since, so an unchanged
+hour costs a 304 instead of a full download and parse.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from telemetry import query_labels, timed_stage
+from treasure_parser import parse_rows
+
+TREASURE_URL = "https://a.windbornesystems.com/treasure/{hours}.json"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshot_cache")
+DEFAULT_TTL = 10 * 60  # seconds before an entry is revalidated upstream
+DEFAULT_MAX_ENTRIES = 24
+REQUEST_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+PREFETCH_INTERVAL = 5 * 60  # seconds between background refreshes
+PREFETCH_WORKERS = 8
+FAILURE_TTL = 60  # seconds a failed or empty hour is not re-requested on demand
+
+
+def make_session(pool_size: int = PREFETCH_WORKERS, retries: int = 3,
+                 backoff: float = 0.5) -> requests.Session:
+    """
+    Keep-alive session with a connection pool and retries with exponential
+    backoff on connection errors and 5xx responses.
+    """
+    retry = Retry(total=retries, backoff_factor=backoff,
+                  status_forcelist=(500, 502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class Snapshot:
+    """
+    One parsed treasure hour plus the validators needed to revalidate it.
+    """
+
+    def __init__(self, hours: str, coords: np.ndarray, version: str,
+                 etag: Optional[str] = None, last_modified: Optional[str] = None,
+                 fetched_at: float = 0.0):
+        self.hours = hours
+        self.coords = coords
+        self.version = version
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def points(self) -> list:
+        """
+        Fresh [lat, lon, alt] lists; callers may mutate them freely.
+        """
+        return self.coords.tolist()
+
+    def meta(self) -> dict:
+        return {
+            'hours': self.hours,
+            'version': self.version,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'fetched_at': self.fetched_at,
+        }
+
+
+class SnapshotStore:
+    """
+    Hour-keyed snapshot cache: in-memory LRU with TTL over an on-disk store.
+    """
+
+    def __init__(self, url_template: str = TREASURE_URL, cache_dir: Optional[str] = CACHE_DIR,
+                 ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 session: Optional[requests.Session] = None):
+        self.url_template = url_template
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.session = session or make_session()
+        # Set while a SnapshotPrefetcher keeps entries fresh; requests then
+        # serve whatever is cached instead of waiting on upstream
+        self.serve_stale = False
+        self._entries = OrderedDict()
+        self._failed = {}  # hours -> time of the last failed or empty fetch
+        self._lock = threading.Lock()
+
+    def get(self, hours: str = "00") -> Optional[Snapshot]:
+        """
+        Snapshot for an hour, revalidating upstream once it is older than the
+        TTL. A stale copy is served if the upstream request fails.
+
+        While a prefetcher is running, uncached hours are left for it to
+        fetch and None is returned; an hour whose last fetch failed or came
+        back empty is not retried for FAILURE_TTL seconds.
+        """
+        snapshot = self._cached(hours)
+        if snapshot is not None and (self.serve_stale or time.time() - snapshot.fetched_at < self.ttl):
+            return snapshot
+        if self.serve_stale or self._recently_failed(hours):
+            return snapshot
+        return self.refresh(hours, snapshot)
+
+    def peek(self, hours: str) -> Optional[Snapshot]:
+        """
+        The cached copy of an hour from memory or disk, however old; never
+        goes upstream.
+        """
+        return self._cached(hours)
+
+    def refresh(self, hours: str, snapshot: Optional[Snapshot] = None) -> Optional[Snapshot]:
+        """
+        Revalidate an hour upstream regardless of its age.
+        """
+        if snapshot is None:
+            snapshot = self._cached(hours)
+        fresh = self._fetch(hours, snapshot)
+        with self._lock:
+            if fresh is None:
+                self._failed[hours] = time.time()
+            else:
+                self._failed.pop(hours, None)
+        if fresh is None:
+            return snapshot
+        # A 304 keeps the cached coords; only the metadata needs rewriting
+        self._remember(fresh, data_changed=snapshot is None or fresh.coords is not snapshot.coords)
+        return fresh
+
+    def points(self, hours: str = "00") -> list:
+        snapshot = self.get(hours)
+        return snapshot.points() if snapshot is not None else []
+
+    def _recently_failed(self, hours: str) -> bool:
+        with self._lock:
+            failed_at = self._failed.get(hours)
+        return failed_at is not None and time.time() - failed_at < FAILURE_TTL
+
+    def _cached(self, hours: str) -> Optional[Snapshot]:
+        with self._lock:
+            snapshot = self._entries.get(hours)
+            if snapshot is not None:
+                self._entries.move_to_end(hours)
+                return snapshot
+        snapshot = self._load(hours)
+        if snapshot is not None:
+            self._remember(snapshot, persist=False)
+        return snapshot
+
+    def _remember(self, snapshot: Snapshot, persist: bool = True, data_changed: bool = True):
+        with self._lock:
+            self._entries[snapshot.hours] = snapshot
+            self._entries.move_to_end(snapshot.hours)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if persist:
+            self._save(snapshot, data_changed)
+
+    def _fetch(self, hours: str, cached: Optional[Snapshot]) -> Optional[Snapshot]:
+        url = self.url_template.format(hours=hours)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        labels = query_labels(int(hours))
+        try:
+            with timed_stage('fetch', **labels):
+                response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 304 and cached is not None:
+                # Unchanged upstream; only the freshness timestamp moves
+                return Snapshot(hours, cached.coords, cached.version, cached.etag,
+                                cached.last_modified, time.time())
+            response.raise_for_status()  # Raise error for bad status codes
+        except requests.RequestException as e:
+            print(f"HTTP error occurred: {e}")
+            return None
+
+        with timed_stage('parse', **labels):
+            coords, errors = parse_rows(response.text)
+        if errors:
+            print(f"[{hours}] {len(errors)} corrupt rows, first: row {errors[0].row}: {errors[0].reason}")
+        if len(coords) == 0:
+            return None
+        return Snapshot(hours, coords, hashlib.sha1(response.content).hexdigest(),
+                        response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                        time.time())
+
+    def _paths(self, hours: str):
+        return (os.path.join(self.cache_dir, f"{hours}.npy"),
+                os.path.join(self.cache_dir, f"{hours}.meta.json"))
+
+    def _load(self, hours: str) -> Optional[Snapshot]:
+        if not self.cache_dir:
+            return None
+        data_path, meta_path = self._paths(hours)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            coords = np.load(data_path)
+        except (OSError, ValueError):
+            return None
+        return Snapshot(hours, coords, meta['version'], meta.get('etag'),
+                        meta.get('last_modified'), meta.get('fetched_at', 0.0))
+
+    def _save(self, snapshot: Snapshot, data_changed: bool = True):
+        if not self.cache_dir:
+            return
+        data_path, meta_path = self._paths(snapshot.hours)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if data_changed:
+                _replace(data_path, "wb", lambda f: np.save(f, snapshot.coords))
+            _replace(meta_path, "w", lambda f: json.dump(snapshot.meta(), f))
+        except OSError as e:
+            print(f"Could not persist snapshot {snapshot.hours}: {e}")
+
+
+def _replace(path: str, mode: str, write: Callable):
+    """
+    Write a file through a uniquely named temp file and rename it into
+    place, so readers never see a partial file and concurrent writers from
+    other processes never share a temp file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SnapshotPrefetcher:
+    """
+    Background thread that refreshes every hour concurrently on a schedule,
+    so page views read snapshots from the store without touching upstream.
+    on_refresh, if given, is called after every round, e.g. to rebuild data
+    derived from the snapshots.
+    """
+
+    def __init__(self, store: SnapshotStore, hours: Iterable[str],
+                 interval: float = PREFETCH_INTERVAL, workers: int = PREFETCH_WORKERS,
+                 on_refresh: Optional[Callable[[], None]] = None):
+        self.store = store
+        self.hours = list(hours)
+        self.interval = interval
+        self.workers = workers
+        self.on_refresh = on_refresh
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_all(self) -> int:
+        """
+        Refresh every hour once; returns how many hours are available.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch") as pool:
+            snapshots = list(pool.map(self.store.refresh, self.hours))
+        return sum(1 for snapshot in snapshots if snapshot is not None)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.store.serve_stale = True
+        self._thread = threading.Thread(target=self._run, name="snapshot-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.store.serve_stale = False
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = time.time()
+            try:
+                available = self.refresh_all()
+                print(f"Prefetched {available}/{len(self.hours)} hours in {time.time() - start:.1f}s")
+                if self.on_refresh is not None:
+                    self.on_refresh()
+            except Exception as e:
+                print(f"Prefetch failed: {e}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,163 @@
+"""
+Per-stage latency histograms in the Prometheus text format.
+
+Each request stage (snapshot fetch and parse, relay selection, graph build,
+Dijkstra, path data, markers, template render) is observed into a histogram
+labelled by hour, range bucket and relay flag, with the graph's edge count
+and Dijkstra's heap operations alongside, so /metrics shows which stage
+dominates the tail latency.
+
+Routing jobs run in compute worker processes: they time their stages into a
+StageTrace, which is returned with the job and observed here by the process
+that submitted it. Histograms are per process, as with the other counters
+under /api; a scrape sees the Flask worker that answers it.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000, 10000000, 100000000)
+
+# Ranges are labelled by bucket so the series stay few whatever the slider says
+RANGE_BUCKET_KM = 250
+RANGE_BUCKET_MAX = 1000
+
+
+def range_bucket(max_range) -> str:
+    """Label for a range in km, e.g. "250-500", or ">1000" past the slider maximum"""
+    if max_range is None:
+        return ""
+    if max_range > RANGE_BUCKET_MAX:
+        return f">{RANGE_BUCKET_MAX}"
+    low = min(int(max_range // RANGE_BUCKET_KM) * RANGE_BUCKET_KM, RANGE_BUCKET_MAX - RANGE_BUCKET_KM)
+    return f"{low}-{low + RANGE_BUCKET_KM}"
+
+
+def query_labels(hour=None, max_range=None, jack_enabled=None) -> Dict[str, str]:
+    """hour, range_bucket and relays label values; unknown ones are empty"""
+    return {
+        'hour': "" if hour is None else str(int(hour)),
+        'range_bucket': range_bucket(max_range),
+        'relays': "" if jack_enabled is None else str(int(bool(jack_enabled))),
+    }
+
+
+def _format(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with one series per label combination.
+    """
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key))
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{_format(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-1]}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {_format(values[-2])}")
+            lines.append(f"{self.name}_count{suffix} {values[-1]}")
+        return lines
+
+
+QUERY_LABELS = ('hour', 'range_bucket', 'relays')
+
+stage_seconds = Histogram(
+    "routing_stage_duration_seconds", "Time spent in each request pipeline stage.",
+    ('stage',) + QUERY_LABELS, DURATION_BUCKETS)
+graph_edges = Histogram(
+    "routing_graph_edges", "Graph edges within range per routing job.",
+    QUERY_LABELS, COUNT_BUCKETS)
+heap_operations = Histogram(
+    "routing_dijkstra_heap_operations", "Dijkstra heap pushes and pops per routing job.",
+    ('op',) + QUERY_LABELS, COUNT_BUCKETS)
+
+HISTOGRAMS = [stage_seconds, graph_edges, heap_operations]
+
+
+@contextmanager
+def timed_stage(stage: str, **labels):
+    """Observe the duration of the with block as one stage, even if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage, **labels)
+
+
+class StageTrace:
+    """
+    Stage durations and counts of one routing job. Plain dicts, so it can be
+    pickled back from a worker process and observed there by observe().
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, value: int):
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    def observe(self, labels: Optional[Dict[str, str]] = None):
+        labels = labels or {}
+        for name, seconds in self.seconds.items():
+            stage_seconds.observe(seconds, stage=name, **labels)
+        if 'edges' in self.counts:
+            graph_edges.observe(self.counts['edges'], **labels)
+        if 'heap_pops' in self.counts:
+            # The heap is drained at the end of every run, so each push is popped once
+            heap_operations.observe(self.counts['heap_pops'], op="push", **labels)
+            heap_operations.observe(self.counts['heap_pops'], op="pop", **labels)
+
+
+def render_metrics() -> str:
+    """Every histogram in the Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The app modules are top-level scripts in App/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInTreasure:
+    """
+    Local stand-in for the treasure API: serves payloads[hours] at
+    /treasure/<hours>.json with an ETag, answers 304 to a matching
+    If-None-Match, and records every request it receives.
+    """
+
+    def __init__(self):
+        self.payloads = {}
+        self.status = {}  # hours -> forced status code
+        self.requests = []  # (hours, If-None-Match header)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def url_template(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/treasure/{{hours}}.json"
+
+    def requests_for(self, hours):
+        return [etag for requested, etag in self.requests if requested == hours]
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                hours = os.path.basename(self.path).split(".")[0]
+                stand_in.requests.append((hours, self.headers.get("If-None-Match")))
+                status = stand_in.status.get(hours)
+                body = stand_in.payloads.get(hours)
+                if status is None and body is None:
+                    status = 404
+                if status is not None:
+                    self.send_response(status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = f'"{hash(body) & 0xffffffff:x}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def treasure():
+    stand_in = StandInTreasure()
+    stand_in.start()
+    yield stand_in
+    stand_in.stop()
@@ -0,0 +1,40 @@
+import random
+
+import numpy as np
+import pytest
+
+from network import RangeGraph
+from pipeline import compute_metrics
+from pointset import PALO_ALTO_OFFICE, PointSet
+
+
+def balloons_around_hq(n, seed):
+    """
+    Balloons within a couple of thousand km of HQ, so the curve has many
+    breakpoints below the slider maximum.
+    """
+    rng = random.Random(seed)
+    lat, lon, _ = PALO_ALTO_OFFICE
+    return np.array([[lat + rng.uniform(-15, 15), lon + rng.uniform(-20, 20), rng.uniform(0, 25)]
+                     for _ in range(n)])
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_curve_matches_dijkstra_at_the_breakpoints(seed):
+    points = PointSet.build(balloons_around_hq(200, seed))
+    graph = RangeGraph(points)
+    curve = graph.coverage_curve()
+    assert len(curve.thresholds) > 5
+    assert curve.total == 200
+
+    def reachable(max_range):
+        distances = graph.shortest_paths(max_range)
+        return compute_metrics(points, distances, points.fcc_start)['reachable_satellites']
+
+    # At a breakpoint its edge is still excluded (ranges are strict); one
+    # ulp above it the edge is admitted
+    for threshold in curve.thresholds.tolist():
+        above = float(np.nextafter(threshold, np.inf))
+        assert curve.reachable(threshold) == reachable(threshold)
+        assert curve.reachable(above) == reachable(above)
+    assert curve.reachable(graph.max_range) == reachable(graph.max_range)
@@ -0,0 +1,15 @@
+import os
+
+from executor import ComputeExecutor
+from sharded_neighbors import default_workers
+
+
+def test_compute_workers_split_the_cores_between_their_shard_pools(tmp_path):
+    executor = ComputeExecutor(str(tmp_path / "results.sqlite"), workers=2)
+    executor.start()
+    share = max(1, (os.cpu_count() or 1) // 2)
+    try:
+        assert executor.call("shard-workers", default_workers).result(timeout=30) == share
+    finally:
+        executor.shutdown()
+    assert default_workers() == (os.cpu_count() or 1)
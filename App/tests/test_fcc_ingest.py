@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pytest
+
+from fcc_ingest import FEET_PER_METER, RELAY_DTYPE, RELAY_TYPES, ingest, load_relays, write_synthetic_dump
+from geometry import to_xyz
+
+MALFORMED = [
+    "SHORT1|40|30\n",  # cut short: no height or type
+    "JUNK1|4x|30|0.0|N|100|0|0.0|W|500|Earth Station|Junk - Tower\n",
+    "JUNK2|40|30|0.0|N|100|0|0.0|W|tall|Microwave Relay|Junk - Tower\n",
+    "FAR1|95|0|0.0|N|100|0|0.0|W|500|Earth Station|Far - Tower\n",
+    "SOUTH1|33|52|0.0|S|151|12|0.0|E|600|Government Facility|Sydney - Tower\n",
+    "\n",
+]
+
+
+def expected_relays(path, min_height=150):
+    """Row-by-row filter over the dump, as filter_facilities applies it"""
+    relays = []
+    with open(path) as f:
+        header = f.readline().rstrip("\n").split("|")
+        for line in f:
+            fields = dict(zip(header, line.rstrip("\n").split("|")))
+
+            def number(name):
+                try:
+                    return float(fields.get(name, ""))
+                except ValueError:
+                    return math.nan
+
+            def degrees(axis, negative):
+                sign = -1.0 if fields.get(f"{axis}_dir", "").upper() == negative else 1.0
+                minutes, seconds = number(f"{axis}_min"), number(f"{axis}_sec")
+                return sign * (number(f"{axis}_deg") + (0 if math.isnan(minutes) else minutes) / 60
+                               + (0 if math.isnan(seconds) else seconds) / 3600)
+
+            lat, lon, height = degrees("lat", "S"), degrees("lon", "W"), number("structure_height")
+            kind = fields.get("facility_type", "")
+            if not (height >= min_height and kind in RELAY_TYPES and abs(lat) <= 90 and abs(lon) <= 180):
+                continue
+            location = fields.get("location", "").split(" - ")[0]
+            relays.append((lat, lon, height / FEET_PER_METER, RELAY_TYPES.index(kind),
+                           fields["callsign"], f"{kind} ({location})"))
+    return relays
+
+
+@pytest.mark.parametrize("block_rows", [1, 97, 100000])
+def test_ingest_matches_a_row_by_row_filter(tmp_path, block_rows):
+    dump = str(tmp_path / "asr.dat")
+    write_synthetic_dump(dump, 1500, seed=4, block_rows=400)
+    with open(dump, "a") as f:
+        f.writelines(MALFORMED)
+    output = str(tmp_path / "relays.npy")
+
+    counts = ingest(dump, output, block_rows=block_rows)
+    relays = load_relays(output)
+    expected = expected_relays(dump)
+
+    assert counts == {'rows': 1500 + len(MALFORMED), 'relays': len(expected)}
+    assert isinstance(relays, np.memmap)
+    assert relays.dtype == RELAY_DTYPE
+    assert len(relays) == len(expected)
+    lat, lon, alt, kind, callsign, label = map(list, zip(*expected))
+    assert np.allclose(relays['lat'], lat, rtol=0, atol=1e-9)
+    assert np.allclose(relays['lon'], lon, rtol=0, atol=1e-9)
+    assert np.allclose(relays['alt'], alt)
+    assert np.allclose(relays['xyz'], [to_xyz(*row) for row in zip(lat, lon, alt)])
+    assert relays['type'].tolist() == kind
+    assert [value.decode() for value in relays['callsign']] == callsign
+    assert [value.decode() for value in relays['label']] == label
+    assert callsign[-1] == "SOUTH1" and lat[-1] < 0 and lon[-1] > 0
+
+
+def test_missing_columns_are_rejected(tmp_path):
+    dump = tmp_path / "asr.dat"
+    dump.write_text("callsign|lat|lon\nA|1|2\n")
+    with pytest.raises(ValueError, match="structure_height"):
+        ingest(str(dump), str(tmp_path / "relays.npy"))
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from landmask import LAND_SHAPEFILE, LandMask, rasterize
+
+
+@pytest.fixture(scope="module")
+def land_mask():
+    # Coarser than the default to keep rasterizing fast; the points below
+    # are well away from any coastline
+    return LandMask.from_shapefile(LAND_SHAPEFILE, resolution=0.5)
+
+
+@pytest.mark.parametrize("lat, lon", [
+    (39.0, -98.0),     # Kansas
+    (51.5, -0.1),      # London
+    (-17.8, 178.0),    # Fiji
+    (-75.0, 90.0),     # East Antarctica
+    (-89.9, 0.0),      # next to the south pole
+    (-90.0, 45.0),     # the pole itself, clipped into the last row
+    (-85.0, 179.9),    # Antarctica either side of the antimeridian
+    (-85.0, -179.9),
+    (67.5, 179.5),     # Chukotka either side of the antimeridian
+    (67.5, -179.5),
+])
+def test_known_land(land_mask, lat, lon):
+    assert land_mask.contains(lat, lon)
+
+
+@pytest.mark.parametrize("lat, lon", [
+    (0.0, -150.0),     # central Pacific
+    (45.0, -30.0),     # North Atlantic
+    (0.0, 180.0),      # Pacific on the antimeridian
+    (60.0, 179.9),     # Bering Sea
+    (90.0, 0.0),       # north pole
+])
+def test_known_ocean(land_mask, lat, lon):
+    assert not land_mask.contains(lat, lon)
+
+
+def test_longitudes_wrap(land_mask):
+    lat = np.full(4, 67.5)
+    expected = land_mask.contains(lat, np.full(4, 179.5))
+    for lon in (-180.5, 539.5, -540.5):
+        assert np.array_equal(land_mask.contains(lat, np.full(4, lon)), expected)
+    assert land_mask.contains(67.5, 180.0) == land_mask.contains(67.5, -180.0)
+
+
+def test_contains_broadcasts_and_rejects_non_finite(land_mask):
+    on_land = land_mask.contains([39.0, 0.0, np.nan, 39.0], [-98.0, -150.0, -98.0, np.inf])
+    assert on_land.tolist() == [True, False, False, False]
+    assert land_mask.contains(39.0, -98.0).shape == ()
+
+
+def test_rasterize_fills_even_odd():
+    square = np.array([[-10.0, -10.0], [10.0, -10.0], [10.0, 10.0], [-10.0, 10.0]])
+    hole = square / 2
+    mask = LandMask(np.packbits(rasterize([square, hole], 1.0), axis=1), 1.0)
+    assert mask.contains(8.5, 8.5)
+    assert mask.contains(-8.5, -8.5)
+    assert not mask.contains(0.0, 0.0)
+    assert not mask.contains(10.5, 0.0)
+    assert not mask.contains(0.0, 170.0)
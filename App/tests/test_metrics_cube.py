@@ -0,0 +1,38 @@
+import numpy as np
+
+from metrics_cube import METRIC_FIELDS, MetricsCube, range_buckets
+
+
+def make_cube(hours, versions, jack_enabled=False, relay_version=""):
+    ranges = range_buckets()
+    values = np.arange(len(hours) * len(ranges) * len(METRIC_FIELDS), dtype=np.float32)
+    return MetricsCube(hours, versions, ranges, values.reshape(len(hours), len(ranges), -1),
+                       jack_enabled, relay_version)
+
+
+def test_rows_follow_their_snapshot_when_the_hour_window_shifts():
+    cube = make_cube([0, 1, 2], ["c", "b", "a"])
+    # An hour later every snapshot is one hour older
+    assert np.array_equal(cube.row("c"), cube.values[0])
+    assert np.array_equal(cube.row("a"), cube.values[2])
+    assert cube.row("d") is None
+
+
+def test_saved_cube_round_trips(tmp_path):
+    cube = make_cube([0, 1], ["b", "a"])
+    path = str(tmp_path / "metrics-0.npz")
+    cube.save(path)
+    loaded = MetricsCube.load(path)
+    assert loaded.key == cube.key
+    assert np.array_equal(loaded.values, cube.values)
+    assert loaded.metrics(1, 14)["total_satellites"] == int(cube.values[1, 1, 0])
+
+
+def test_relay_catalog_version_is_part_of_the_cube(tmp_path):
+    cube = make_cube([0, 1], ["b", "a"], True, "relays-a")
+    assert cube.key != make_cube([0, 1], ["b", "a"], True, "relays-b").key
+    assert cube.matches({0: "b", 1: "a"}, "relays-a")
+    assert not cube.matches({0: "b", 1: "a"}, "relays-b")
+    path = str(tmp_path / "metrics-1.npz")
+    cube.save(path)
+    assert MetricsCube.load(path).relay_version == "relays-a"
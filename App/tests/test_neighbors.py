@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+from bench_neighbors import random_points, scalar_neighbor_lists
+from geometry import distance_3d, positions_xyz
+from neighbors import GRID_MIN_POINTS, dense_neighbor_lists, grid_neighbor_lists, xyz_neighbor_lists
+
+
+def clustered_points(n, seed):
+    """
+    HQ plus points scattered a few hundred km around a handful of centres,
+    so many pairs sit close to any threshold in that range.
+    """
+    rng = random.Random(seed)
+    centres = [(rng.uniform(-60, 60), rng.uniform(-180, 180)) for _ in range(5)]
+    points = [[37.419, -122.106, 0, 0]]
+    for i in range(1, n):
+        lat, lon = rng.choice(centres)
+        points.append([lat + rng.uniform(-3, 3), lon + rng.uniform(-3, 3), rng.uniform(0, 25), i])
+    return points
+
+
+def threshold_ranges(points, seed):
+    """
+    Ranges equal to some pair distances (the pair must be left out, the test
+    is strict) and one ulp above them (it must be included).
+    """
+    rng = random.Random(seed)
+    ranges = []
+    for _ in range(3):
+        a, b = rng.sample(range(len(points)), 2)
+        d = distance_3d(points[a], points[b])
+        ranges += [d, float(np.nextafter(d, np.inf))]
+    return ranges
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("max_distance", [50.0, 500.0, 3000.0])
+def test_grid_matches_scalar_scan_on_random_points(seed, max_distance):
+    points = random_points(300, seed)
+    expected = scalar_neighbor_lists(points, max_distance)
+    assert grid_neighbor_lists(points, max_distance) == expected
+    assert dense_neighbor_lists(points, max_distance) == expected
+
+
+def scalar_distances(points):
+    """distance_3d for every ordered pair, as the scalar scan computes it"""
+    return [[(point2[3], distance_3d(point1, point2)) for point2 in points if point2[3] != point1[3]]
+            for point1 in points]
+
+
+@pytest.mark.parametrize("seed", [2, 3])
+def test_grid_matches_scalar_scan_at_the_threshold(seed):
+    points = clustered_points(GRID_MIN_POINTS + 20, seed)
+    xyz = positions_xyz(points)
+    distances = scalar_distances(points)
+    for max_distance in threshold_ranges(points, seed):
+        expected = [[(j, d) for j, d in row if d < max_distance] for row in distances]
+        assert grid_neighbor_lists(points, max_distance) == expected
+        assert xyz_neighbor_lists(xyz, max_distance) == expected
@@ -0,0 +1,43 @@
+import numpy as np
+
+from neighbors import xyz_neighbor_lists
+from pipeline import compute_metrics, compute_stations, ground_stations
+from pointset import PointSet
+from registry import ResultRegistry, result_key
+from results import RoutingResult
+from routing import dijkstra, multi_source_dijkstra
+
+
+def test_relay_catalog_version_only_keys_relay_results():
+    assert result_key("v1", 0, 500, True, "relays-a") != result_key("v1", 0, 500, True, "relays-b")
+    assert result_key("v1", 0, 500, False, "relays-a") == result_key("v1", 0, 500, False, "relays-b")
+
+
+def test_every_input_changes_the_key():
+    base = result_key("v1", 0, 500, True, "relays-a")
+    assert base != result_key("v2", 0, 500, True, "relays-a")
+    assert base != result_key("v1", 1, 500, True, "relays-a")
+    assert base != result_key("v1", 0, 500.5, True, "relays-a")
+    assert base != result_key("v1", 0, 500, False, "relays-a")
+
+
+def test_stations_are_stored_when_first_computed(tmp_path):
+    balloons = np.array([[37.0, -121.0, 18.0], [38.0, -120.0, 19.0], [39.0, -118.0, 20.0]])
+    relays = np.array([[38.5, -119.0, 0.1]])
+    points = PointSet.build(balloons, relays)
+    graph = xyz_neighbor_lists(points.xyz, 300)
+    distances = dijkstra(graph)
+    metrics = compute_metrics(points, distances, points.fcc_start)
+    result = RoutingResult(points, distances, points.fcc_start, {}, metrics, key="k")
+    registry = ResultRegistry(str(tmp_path / "results.sqlite"))
+    registry.put(result, 0, 300, True, "v1")
+    assert registry.get("k").stations is None
+
+    stations = compute_stations(points, 300)
+    expected = multi_source_dijkstra(graph, ground_stations(points))
+    assert stations.as_arrays()[0].tolist() == expected.as_arrays()[0].tolist()
+    assert registry.put_stations("k", stations)
+    stored = registry.get("k").stations
+    assert stored.sources == stations.sources
+    assert stored.origins().tolist() == stations.origins().tolist()
+    assert not registry.put_stations("missing", stations)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from geometry import ecef
+from relays import GRID_CACHE_SIZE, RelayCatalog
+
+
+def random_sites(n, seed, lat=(25, 50), lon=(-125, -65)):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(*lat, n), rng.uniform(*lon, n), rng.uniform(0, 0.5, n)
+
+
+def brute_force_near(catalog, xyz, max_range):
+    xyz = xyz[np.isfinite(xyz).all(axis=1)]
+    d = np.sqrt(((catalog.xyz[:, None, :] - xyz[None, :, :]) ** 2).sum(axis=2))
+    return np.nonzero((d < max_range).any(axis=1))[0]
+
+
+@pytest.mark.parametrize("max_range", [25.0, 150.0, 1000.0])
+def test_near_matches_brute_force(max_range):
+    lat, lon, alt = random_sites(3000, seed=5)
+    catalog = RelayCatalog(lat, lon, alt, [f"relay {i}" for i in range(len(lat))])
+    # Balloons over and well outside the relays' bounding box, plus a NaN row
+    b_lat, b_lon, b_alt = random_sites(200, seed=6, lat=(-60, 70), lon=(-180, 180))
+    balloons = ecef(b_lat, b_lon, b_alt + 20)
+    balloons[7] = np.nan
+    assert np.array_equal(catalog.near(balloons, max_range), brute_force_near(catalog, balloons, max_range))
+
+
+def test_near_with_a_single_relay():
+    catalog = RelayCatalog(np.array([37.4]), np.array([-122.1]), np.array([0.1]), ["HQ tower"])
+    close = ecef(np.array([37.5]), np.array([-122.0]), np.array([18.0]))
+    far = ecef(np.array([-33.9]), np.array([151.2]), np.array([18.0]))
+    assert catalog.near(close, 100).tolist() == [0]
+    assert catalog.near(far, 100).tolist() == []
+    assert catalog.near(close, 0).tolist() == []
+
+
+def test_grid_cache_is_bounded():
+    lat, lon, alt = random_sites(500, seed=7)
+    catalog = RelayCatalog(lat, lon, alt, [""] * len(lat))
+    balloons = ecef(lat[:10], lon[:10], alt[:10] + 20)
+    for max_range in range(100, 100 + 10 * GRID_CACHE_SIZE, 10):
+        catalog.near(balloons, float(max_range))
+    assert len(catalog._grids) == GRID_CACHE_SIZE
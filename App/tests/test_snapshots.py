@@ -0,0 +1,128 @@
+import json
+import os
+
+from snapshots import SnapshotStore, make_session
+
+PAYLOAD = "[[37.4, -122.1, 12.0], [40.7, -74.0, 18.5]]"
+
+
+def make_store(treasure, **kwargs):
+    return SnapshotStore(url_template=treasure.url_template, session=make_session(retries=0), **kwargs)
+
+
+def test_uncached_hour_is_left_to_the_prefetcher(treasure):
+    treasure.payloads["03"] = PAYLOAD
+    store = make_store(treasure, cache_dir=None)
+    store.serve_stale = True
+    assert store.get("03") is None
+    assert treasure.requests == []
+
+
+def test_empty_and_failed_hours_are_not_refetched_on_every_request(treasure):
+    treasure.payloads["04"] = "[]"
+    treasure.status["05"] = 500
+    store = make_store(treasure, cache_dir=None)
+    for _ in range(3):
+        assert store.get("04") is None
+        assert store.get("05") is None
+    assert len(treasure.requests_for("04")) == 1
+    assert len(treasure.requests_for("05")) == 1
+
+
+def test_prefetcher_refresh_still_retries_failed_hours(treasure):
+    treasure.status["06"] = 500
+    store = make_store(treasure, cache_dir=None)
+    assert store.get("06") is None
+    del treasure.status["06"]
+    treasure.payloads["06"] = PAYLOAD
+    assert len(store.refresh("06")) == 2
+    assert len(store.get("06")) == 2
+    assert len(treasure.requests_for("06")) == 2
+
+
+def test_peek_reads_only_the_cache(treasure, tmp_path):
+    treasure.payloads["07"] = PAYLOAD
+    store = make_store(treasure, cache_dir=str(tmp_path))
+    assert store.peek("07") is None
+    assert treasure.requests == []
+    store.refresh("07")
+    restarted = make_store(treasure, cache_dir=str(tmp_path))
+    assert len(restarted.peek("07")) == 2
+    assert len(treasure.requests) == 1
+
+
+def test_fresh_entries_are_served_without_a_request(treasure):
+    treasure.payloads["00"] = PAYLOAD
+    store = make_store(treasure, cache_dir=None)
+    first = store.get("00")
+    assert store.get("00") is first
+    assert len(treasure.requests) == 1
+
+
+def test_expired_entry_is_revalidated_with_its_etag(treasure):
+    treasure.payloads["00"] = PAYLOAD
+    store = make_store(treasure, cache_dir=None, ttl=0)
+    first = store.get("00")
+    second = store.get("00")
+    etags = treasure.requests_for("00")
+    assert etags == [None, first.etag]
+    # 304: same data and version, only the fetch time moves
+    assert second.version == first.version
+    assert second.coords is first.coords
+    assert second.fetched_at >= first.fetched_at
+
+
+def test_changed_upstream_replaces_the_entry(treasure):
+    treasure.payloads["00"] = PAYLOAD
+    store = make_store(treasure, cache_dir=None, ttl=0)
+    first = store.get("00")
+    treasure.payloads["00"] = "[[1.0, 2.0, 3.0]]"
+    second = store.get("00")
+    assert second.version != first.version
+    assert second.coords.tolist() == [[1.0, 2.0, 3.0]]
+
+
+def test_least_recently_used_hour_is_evicted(treasure):
+    for hours in ("00", "01", "02"):
+        treasure.payloads[hours] = PAYLOAD
+    store = make_store(treasure, cache_dir=None, max_entries=2)
+    store.get("00")
+    store.get("01")
+    store.get("00")  # "01" is now the least recently used
+    store.get("02")
+    assert store.peek("01") is None
+    assert store.peek("00") is not None and store.peek("02") is not None
+    store.get("01")
+    assert len(treasure.requests_for("01")) == 2
+    assert len(treasure.requests_for("00")) == 1
+
+
+def test_restart_reloads_the_disk_cache(treasure, tmp_path):
+    treasure.payloads["00"] = PAYLOAD
+    first = make_store(treasure, cache_dir=str(tmp_path)).get("00")
+    restarted = make_store(treasure, cache_dir=str(tmp_path)).get("00")
+    assert len(treasure.requests) == 1
+    assert restarted.version == first.version
+    assert restarted.etag == first.etag
+    assert restarted.coords.tolist() == first.coords.tolist()
+
+
+def test_restart_revalidates_an_expired_disk_entry(treasure, tmp_path):
+    treasure.payloads["00"] = PAYLOAD
+    first = make_store(treasure, cache_dir=str(tmp_path)).get("00")
+    restarted = make_store(treasure, cache_dir=str(tmp_path), ttl=0).get("00")
+    assert treasure.requests_for("00") == [None, first.etag]
+    assert restarted.version == first.version
+
+
+def test_revalidation_rewrites_only_the_metadata(treasure, tmp_path):
+    treasure.payloads["00"] = PAYLOAD
+    store = make_store(treasure, cache_dir=str(tmp_path), ttl=0)
+    first = store.get("00")
+    data_path, meta_path = tmp_path / "00.npy", tmp_path / "00.meta.json"
+    os.utime(data_path, ns=(0, 0))
+    second = store.get("00")
+    assert treasure.requests_for("00") == [None, first.etag]
+    assert data_path.stat().st_mtime_ns == 0
+    assert json.loads(meta_path.read_text())["fetched_at"] == second.fetched_at
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["00.meta.json", "00.npy"]
@@ -0,0 +1,49 @@
+import numpy as np
+
+from network import RangeGraph
+from pointset import PointSet
+from timegraph import NEVER, TimeExpandedGraph
+
+MAX_RANGE = 500.0
+
+# Balloon rows per hour, oldest first. Near HQ means within range of Palo Alto.
+NEAR_HQ = [38.0, -122.0, 15.0]
+# Rows 1 and 2 share a component an hour ago; only row 1 drifts into range
+# of HQ afterwards. Row 3 is never within range of anything.
+HOUR_AGO = [NEAR_HQ, [0.0, 0.0, 15.0], [1.0, 0.0, 15.0], [-40.0, 100.0, 15.0]]
+NOW = [[-20.0, 50.0, 15.0], [37.0, -121.0, 15.0], [10.0, 10.0, 15.0], [-40.0, 100.0, 15.0]]
+
+
+def two_hour_graph():
+    graphs = [RangeGraph(PointSet.build(np.array(coords)), MAX_RANGE) for coords in (HOUR_AGO, NOW)]
+    return TimeExpandedGraph([1, 0], graphs, MAX_RANGE)
+
+
+def test_earliest_arrival_over_two_hours():
+    timeline = two_hour_graph()
+    # Global ids are balloon rows; HQ has none
+    assert timeline.earliest_arrival(1, 0) == 1
+    assert timeline.earliest_arrival(1, 1) == 0
+    assert timeline.earliest_arrival(1, 2) == 0
+    assert timeline.earliest_arrival(1, 3) is None
+    assert timeline.earliest_arrival(0, 0) is None
+    assert timeline.earliest_arrival(0, 1) == 0
+    assert timeline.earliest_arrival(0, 2) is None
+
+
+def test_handoffs_follow_the_carrier():
+    timeline = two_hour_graph()
+    assert timeline.handoffs(1, 0) == [(1, 0)]
+    # Row 2 passes the message to row 1 an hour ago, which carries it to HQ
+    assert timeline.handoffs(1, 2) == [(1, 2), (0, 1)]
+    assert timeline.carrier[0, 2] == 1
+    assert timeline.carrier[1, 1] == NEVER
+    assert timeline.handoffs(1, 3) == []
+
+
+def test_summary_counts_delays():
+    starts = two_hour_graph().summary()['starts']
+    assert starts[0] == {'hour': 1, 'balloons': 4, 'delivered': 3, 'immediate': 1,
+                         'mean_delay': 0.67, 'delay_histogram': [1, 2]}
+    assert starts[1] == {'hour': 0, 'balloons': 4, 'delivered': 1, 'immediate': 1,
+                         'mean_delay': 0.0, 'delay_histogram': [1]}
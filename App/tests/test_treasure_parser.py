@@ -0,0 +1,30 @@
+import numpy as np
+
+from treasure_parser import parse_rows
+
+
+def test_clean_payload():
+    coords, errors = parse_rows("[[37.4, -122.1, 12], [40.7, -74.0, 18.5]]")
+    assert errors == []
+    assert coords.dtype == np.float64
+    assert np.array_equal(coords, [[37.4, -122.1, 12.0], [40.7, -74.0, 18.5]])
+
+
+def test_empty_payload():
+    coords, errors = parse_rows("[]")
+    assert coords.shape == (0, 3)
+    assert errors == []
+
+
+def test_non_finite_and_truncated_rows_are_reported_in_place():
+    coords, errors = parse_rows("[[1, 2, 3], [NaN, 5, 6], [7, 8, 9], [10, 11")
+    assert [(error.row, error.reason) for error in errors] == [(1, "non-finite value"), (3, "unterminated row")]
+    assert np.array_equal(coords[[0, 2]], [[1, 2, 3], [7, 8, 9]])
+    assert np.isnan(coords[[1, 3]]).all()
+
+
+def test_valid_json_that_is_not_numeric_rows_falls_back():
+    coords, errors = parse_rows('[[1, 2, 3], ["4", 5, 6], [7, 8]]')
+    assert [(error.row, error.reason) for error in errors] == [
+        (1, "unparseable value '\"4\"'"), (2, "expected 3 values, got 2")]
+    assert np.array_equal(coords[0], [1, 2, 3])
@@ -0,0 +1,164 @@
+"""
+Time-expanded routing across the hourly snapshots.
+
+Balloons move, so a message that cannot reach HQ now may get there later by
+store-and-forward: relayed instantly within an hour's neighbor graph, then
+carried by a balloon (or held by a relay) into the next hour. The graph
+stacks one layer per hour and links each balloon to itself in the following
+layer, matching balloons by their row in the treasure data.
+
+Each layer is reduced to connected-component labels over that hour's
+existing RangeGraph edges (no distances are recomputed). A backward sweep
+from the newest layer then gives, for every node and hour, the earliest hour
+a message held there can reach HQ, plus the node that should carry it into
+the next hour. Storage is a few small integer arrays per layer.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from connectivity import connected_components
+from network import RangeGraph
+from pointset import BALLOON, RELAY
+
+NEVER = -1
+
+
+class TimeExpandedGraph:
+    """
+    Earliest-arrival routing to HQ over hourly layers, oldest first.
+
+    Nodes are identified across layers by a global id: balloon row i has id
+    i, relay catalog row j has id n_balloons + j, where n_balloons is the
+    most balloons in any layer. HQ is the sink and has no global id. For layer t and global
+    id g, arrival[t, g] is the index of the first layer in which a message
+    held by g during layer t reaches HQ (NEVER if it does not), and
+    carrier[t, g] the global id that takes it into layer t + 1.
+    """
+
+    def __init__(self, hours: Sequence[int], graphs: Sequence[RangeGraph], max_range: float):
+        if len(hours) != len(graphs) or not graphs:
+            raise ValueError("need one RangeGraph per hour")
+        self.hours = list(hours)
+        self.max_range = max_range
+        self.n_balloons = max(graph.points.count(BALLOON) for graph in graphs)
+        self.n_relays = max(self._relay_rows(graph.points).max(initial=-1) + 1 for graph in graphs)
+        size = self.n_balloons + self.n_relays
+        layers = len(graphs)
+        index_type = np.int16 if layers < np.iinfo(np.int16).max else np.int32
+        self.arrival = np.full((layers, size), NEVER, dtype=index_type)
+        self.carrier = np.full((layers, size), NEVER, dtype=np.int32)
+        self.present = np.zeros((layers, size), dtype=bool)
+
+        for t in range(layers - 1, -1, -1):
+            self._sweep_layer(t, graphs[t])
+
+    @staticmethod
+    def _relay_rows(points) -> np.ndarray:
+        """
+        Relay catalog row per relay node; layers may include different
+        subsets of the catalog.
+        """
+        if points.relay_rows is not None:
+            return np.asarray(points.relay_rows, dtype=np.int64)
+        return np.arange(points.count(RELAY))
+
+    def _global_ids(self, graph: RangeGraph) -> np.ndarray:
+        """
+        Global id per local node of a layer; HQ and invalid positions get -1.
+        """
+        points = graph.points
+        ids = np.full(len(points), NEVER, dtype=np.int64)
+        balloons = np.nonzero(points.kind == BALLOON)[0]
+        relays = np.nonzero(points.kind == RELAY)[0]
+        ids[balloons] = np.arange(len(balloons))
+        ids[relays] = self.n_balloons + self._relay_rows(points)
+        ids[~points.valid] = NEVER
+        return ids
+
+    def _sweep_layer(self, t: int, graph: RangeGraph):
+        k = graph.edge_count(self.max_range)
+        labels = connected_components(graph.n, graph.src[:k], graph.dst[:k])
+        ids = self._global_ids(graph)
+        local = np.nonzero(ids >= 0)[0]
+        global_ids = ids[local]
+        self.present[t, global_ids] = True
+
+        # Best arrival when carried into the next layer by each node
+        big = np.iinfo(np.int64).max
+        carried = np.full(graph.n, big, dtype=np.int64)
+        if t + 1 < len(self.arrival):
+            following = self.arrival[t + 1, global_ids].astype(np.int64)
+            carried[local] = np.where(following >= 0, following, big)
+
+        # Within a layer every node of a component can pass the message on
+        # instantly, so the component's best carrier serves all its members
+        order = np.lexsort((carried[local], labels[local]))
+        members = local[order]
+        first = np.ones(len(members), dtype=bool)
+        first[1:] = labels[members[1:]] != labels[members[:-1]]
+        best_node = np.full(graph.n, NEVER, dtype=np.int64)
+        best_node[labels[members[first]]] = members[first]
+
+        component_best = carried[best_node[labels[local]]]
+        arrival = np.where(component_best < big, component_best, NEVER)
+        carrier = np.where(arrival >= 0, ids[best_node[labels[local]]], NEVER)
+        at_hq = labels[local] == labels[0]
+        arrival[at_hq] = t
+        carrier[at_hq] = NEVER
+        self.arrival[t, global_ids] = arrival
+        self.carrier[t, global_ids] = carrier
+
+    def approx_bytes(self) -> int:
+        return self.arrival.nbytes + self.carrier.nbytes + self.present.nbytes
+
+    def layer(self, hour: int) -> int:
+        return self.hours.index(hour)
+
+    def earliest_arrival(self, start_hour: int, balloon: int) -> Optional[int]:
+        """
+        Hour (as hours ago) at which a message sent by balloon row `balloon`
+        during start_hour first reaches HQ, or None.
+        """
+        t = self.arrival[self.layer(start_hour), balloon]
+        return self.hours[t] if t >= 0 else None
+
+    def handoffs(self, start_hour: int, balloon: int) -> List[Tuple[int, int]]:
+        """
+        (hour, global id) for each node holding the message at the end of an
+        hour, from the start until the hour it reaches HQ; [] if it never does.
+        Within an hour the message follows that layer's shortest paths.
+        """
+        t = self.layer(start_hour)
+        node = balloon
+        if self.arrival[t, node] < 0:
+            return []
+        chain = [(self.hours[t], node)]
+        while self.arrival[t, node] != t:
+            node = int(self.carrier[t, node])
+            t += 1
+            chain.append((self.hours[t], node))
+        return chain
+
+    def summary(self) -> dict:
+        """
+        Per start hour: balloons present, how many eventually reach HQ, and
+        the distribution of delivery delays in hours.
+        """
+        starts = []
+        balloons = slice(0, self.n_balloons)
+        for t, hour in enumerate(self.hours):
+            present = self.present[t, balloons]
+            arrival = self.arrival[t, balloons][present]
+            delivered = arrival >= 0
+            delays = (arrival[delivered] - t).astype(np.int64)
+            starts.append({
+                'hour': hour,
+                'balloons': int(present.sum()),
+                'delivered': int(delivered.sum()),
+                'immediate': int((delays == 0).sum()),
+                'mean_delay': round(float(delays.mean()), 2) if len(delays) else None,
+                'delay_histogram': np.bincount(delays, minlength=1).tolist() if len(delays) else [],
+            })
+        return {'hours': self.hours, 'max_range': self.max_range, 'starts': starts}
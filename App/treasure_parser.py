@@ -0,0 +1,156 @@
+"""
+Single-pass parser for treasure payloads.
+
+The treasure files are a JSON array of [lat, lon, alt] rows, but some hours
+arrive corrupted: NaN/Infinity tokens, truncated rows, stray text. Clean
+payloads go through json.loads, which is the fastest way to read them. For
+the rest, instead of a line-by-line sanitize-and-reparse fallback, one regex
+scan splits the body into rows and the values go straight into a float array.
+Rows that cannot be read are reported with their index and reason.
+"""
+
+import json
+import re
+from collections import namedtuple
+from typing import List, Tuple
+
+import numpy as np
+
+# A complete row: everything between "[" and the next "]"
+_CLOSED_ROW = re.compile(r'\[([^\[\]]*)\]')
+
+# A row runs from "[" to the matching "]", or is cut short by the next "[" or
+# the end of the payload (a truncated row)
+_ROW = re.compile(r'\[([^\[\]]*)(\]|(?=\[)|$)')
+
+# Tokens float() does not accept, mapped to what it does; NaN and Infinity
+# are already understood by float()
+_TOKENS = {'null': 'nan'}
+
+RowError = namedtuple('RowError', ['row', 'reason', 'text'])
+
+
+def _bulk_floats(bodies: List[str]) -> np.ndarray:
+    """
+    Convert row bodies of exactly three fields in one pass; raises ValueError
+    if any value is not a number.
+    """
+    joined = ",".join(bodies)
+    for token, replacement in _TOKENS.items():
+        joined = joined.replace(token, replacement)
+    values = np.array(list(map(float, joined.split(','))), dtype=np.float64)
+    return values.reshape(-1, 3)
+
+
+def _reject_constant(token: str):
+    # Stops json.loads at the first NaN/Infinity, which parse_rows reports
+    raise ValueError(token)
+
+
+def _json_rows(text: str):
+    """
+    The payload as an (n, 3) float64 array if it is valid JSON holding only
+    finite numeric rows of three values, otherwise None.
+    """
+    try:
+        coords = np.asarray(json.loads(text, parse_constant=_reject_constant))
+    except (ValueError, RecursionError):  # JSONDecodeError, NaN tokens, ragged rows
+        return None
+    if coords.size == 0 and coords.ndim == 1:
+        return np.empty((0, 3))
+    if coords.ndim != 2 or coords.shape[1] != 3 or coords.dtype.kind not in 'if':
+        return None
+    coords = coords.astype(np.float64, copy=False)
+    return coords if np.isfinite(coords).all() else None
+
+
+def _row_values(body: str):
+    """
+    The three floats of a row body, or a reason string if it is corrupt.
+    """
+    parts = body.split(',')
+    if len(parts) != 3:
+        return f"expected 3 values, got {len(parts) if body.strip() else 0}"
+    values = []
+    for part in parts:
+        token = part.strip()
+        try:
+            values.append(float(_TOKENS.get(token, token)))
+        except ValueError:
+            return f"unparseable value {token[:20]!r}"
+    return values
+
+
+def _scan_rows(text: str):
+    """
+    Row bodies in payload order (None for truncated rows), the indices of
+    rows with exactly three fields, the indices of the others, and the
+    diagnostics for truncated rows.
+    """
+    bodies = []
+    good = []
+    other = []
+    errors = []
+    for body, closed in _ROW.findall(text):
+        if closed:
+            (good if body.count(',') == 2 else other).append(len(bodies))
+            bodies.append(body)
+        elif body.strip(' \t\r\n,'):
+            errors.append(RowError(len(bodies), "unterminated row", body.strip()[:40]))
+            bodies.append(None)
+        # else: the opening bracket of the outer array
+    return bodies, good, other, errors
+
+
+def parse_rows(text: str, drop_invalid: bool = False) -> Tuple[np.ndarray, List[RowError]]:
+    """
+    Parse a treasure payload into an (n, 3) float64 [lat, lon, alt] array.
+
+    Rows that are corrupt or hold non-finite values are reported in the
+    returned diagnostics. They are kept as NaN rows, so node numbering
+    matches the upstream row order, unless drop_invalid is set.
+    """
+    coords = _json_rows(text)
+    if coords is not None:
+        return coords, []
+    errors = []
+
+    # Next fastest: every "[" opens a complete three-value row (plus the outer
+    # array), so all values convert in one call
+    opened = text.count('[')
+    if opened == text.count(']'):
+        bodies = _CLOSED_ROW.findall(text)
+        if opened == len(bodies) + 1 and all(body.count(',') == 2 for body in bodies):
+            try:
+                coords = _bulk_floats(bodies)
+            except ValueError:
+                coords = None
+
+    if coords is None:
+        bodies, good, other, errors = _scan_rows(text)
+        if not good and all(body is not None and not body.strip() for body in bodies):
+            return np.empty((0, 3)), []  # empty payload such as "[]"
+        coords = np.full((len(bodies), 3), np.nan)
+        try:
+            if good:
+                coords[good] = _bulk_floats([bodies[i] for i in good])
+        except ValueError:
+            other = sorted(good + other)
+        for i in other:
+            values = _row_values(bodies[i])
+            if isinstance(values, str):
+                errors.append(RowError(i, values, bodies[i].strip()[:40]))
+            else:
+                coords[i] = values
+
+    finite = np.isfinite(coords).all(axis=1)
+    reported = {error.row for error in errors}
+    for i in np.nonzero(~finite)[0].tolist():
+        if i not in reported:
+            errors.append(RowError(i, "non-finite value", bodies[i].strip()[:40]))
+    coords[~finite] = np.nan
+    errors.sort(key=lambda error: error.row)
+
+    if drop_invalid:
+        coords = coords[finite]
+    return coords, errors